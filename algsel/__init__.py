@@ -1,3 +1,5 @@
+from . import instrumentation
 from .models import *
 from .scenario import *
 from .scoring import *
+from .sweep import *
@@ -0,0 +1,179 @@
+import atexit
+import collections
+import contextlib
+import functools
+import json
+import logging
+import os
+import pandas as pd
+import threading
+import time
+import tracemalloc
+import typing
+
+
+# instrumentation is off by default; every hook first checks this flag
+_enabled = False
+_trace_memory = False
+_started_tracemalloc = False
+_start_time = None
+_events = []
+_counters = collections.Counter()
+_local = threading.local()
+
+
+class _Frame(object):
+
+    def __init__(self, start_memory: int):
+        self.start_memory = start_memory
+        self.max_memory = start_memory
+
+
+def enable(trace_memory: bool = False) -> None:
+    """
+    Starts recording stages and counters. With trace_memory, the tracemalloc
+    peak of every stage is recorded as well (this slows down the program
+    considerably).
+    """
+    global _enabled, _trace_memory, _started_tracemalloc, _start_time
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _started_tracemalloc = True
+    _trace_memory = trace_memory
+    _start_time = time.perf_counter()
+    _enabled = True
+
+
+def disable() -> None:
+    global _enabled, _started_tracemalloc
+    _enabled = False
+    if _started_tracemalloc:
+        tracemalloc.stop()
+        _started_tracemalloc = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def reset() -> None:
+    """
+    Removes all recorded stages and counters
+    """
+    global _start_time
+    del _events[:]
+    _counters.clear()
+    _start_time = time.perf_counter()
+
+
+def _stack() -> typing.List[_Frame]:
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+
+@contextlib.contextmanager
+def stage(name: str, **attributes) -> typing.Iterator[None]:
+    """
+    Records the duration (and optionally the memory peak, relative to the
+    start of the stage) of the enclosed block as stage name. Stages can be
+    nested.
+    """
+    if not _enabled:
+        yield
+        return
+    stack = _stack()
+    trace_memory = _trace_memory and tracemalloc.is_tracing()
+    if trace_memory:
+        current, peak = tracemalloc.get_traced_memory()
+        if stack:
+            # the peak so far belongs to the enclosing stage
+            stack[-1].max_memory = max(stack[-1].max_memory, peak)
+        tracemalloc.reset_peak()
+    frame = _Frame(current if trace_memory else 0)
+    stack.append(frame)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        stack.pop()
+        peak_memory = None
+        if trace_memory and tracemalloc.is_tracing():
+            _, peak = tracemalloc.get_traced_memory()
+            frame.max_memory = max(frame.max_memory, peak)
+            peak_memory = frame.max_memory - frame.start_memory
+            if stack:
+                stack[-1].max_memory = max(stack[-1].max_memory, frame.max_memory)
+        event = {'stage': name, 'start': start - _start_time, 'duration': duration, 'peak_memory': peak_memory,
+                 'depth': len(stack), 'thread': threading.get_ident()}
+        event.update(attributes)
+        _events.append(event)
+
+
+def timed(name: str) -> typing.Callable:
+    """
+    Decorator that records every call of the function as stage name, while
+    instrumentation is enabled
+    """
+    def decorator(function: typing.Callable) -> typing.Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            with stage(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name: str, value: int = 1) -> None:
+    if _enabled:
+        _counters[name] += value
+
+
+def get_trace() -> typing.Dict:
+    return {'events': list(_events), 'counters': dict(_counters)}
+
+
+def write_trace(path: str) -> None:
+    """
+    Writes the recorded stages and counters as JSON
+    """
+    with open(path, 'w') as fp:
+        json.dump(get_trace(), fp, indent=2)
+
+
+def summary() -> pd.DataFrame:
+    """
+    Returns a table with per stage the number of calls, the total, mean and
+    maximal duration (seconds) and the maximal memory peak (bytes)
+    """
+    columns = ['calls', 'total', 'mean', 'max', 'peak_memory']
+    if not _events:
+        return pd.DataFrame(columns=columns, index=pd.Index([], name='stage'))
+    events = pd.DataFrame(_events)
+    grouped = events.groupby('stage')
+    result = pd.DataFrame({
+        'calls': grouped['duration'].count(),
+        'total': grouped['duration'].sum(),
+        'mean': grouped['duration'].mean(),
+        'max': grouped['duration'].max(),
+        'peak_memory': grouped['peak_memory'].max(),
+    })
+    return result.sort_values('total', ascending=False)
+
+
+def _write_trace_at_exit(path: str) -> None:
+    write_trace(path)
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        logging.info('Instrumentation summary (trace written to %s):\n%s' % (path, summary()))
+    if _counters:
+        logging.info('Instrumentation counters: %s' % dict(_counters))
+
+
+# scripts can be instrumented without changes, by setting ALGSEL_TRACE to the
+# path of the JSON trace (and ALGSEL_TRACE_MEMORY=1 for memory peaks)
+if os.environ.get('ALGSEL_TRACE'):
+    enable(trace_memory=os.environ.get('ALGSEL_TRACE_MEMORY') == '1')
+    atexit.register(_write_trace_at_exit, os.environ['ALGSEL_TRACE'])
@@ -1 +1,4 @@
+from .compiled import CompiledForest
+from .encoding import FrameEncoder
 from .model_wrapper import SklearnModelWrapper
+from .serving import Selector, serve_http, serve_stdio
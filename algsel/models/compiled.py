@@ -0,0 +1,212 @@
+import numpy as np
+import sklearn.ensemble
+import sklearn.pipeline
+import sklearn.tree
+import typing
+
+try:
+    from sklearn.impute import SimpleImputer as Imputer
+except ImportError:
+    from sklearn.preprocessing import Imputer
+
+
+TREE_TYPES = (sklearn.tree.DecisionTreeRegressor, sklearn.tree.ExtraTreeRegressor)
+FOREST_TYPES = (sklearn.ensemble.RandomForestRegressor, sklearn.ensemble.ExtraTreesRegressor)
+# rows x trees traversed at once (bounds the size of the temporary arrays)
+CHUNK_SIZE = 1 << 20
+
+
+def _imputer_statistics(imputer) -> typing.Optional[np.ndarray]:
+    # the values that replace NaN, if the imputer only does that
+    if getattr(imputer, 'add_indicator', False) or getattr(imputer, 'axis', 0) != 0:
+        return None
+    missing_values = imputer.missing_values
+    if not (missing_values == 'NaN' or (isinstance(missing_values, float) and np.isnan(missing_values))):
+        return None
+    statistics = np.asarray(imputer.statistics_, dtype=np.float64)
+    if np.isnan(statistics).any():
+        return None  # features without statistics are dropped by the imputer
+    return statistics
+
+
+def _decompose(model) -> typing.Optional[typing.Tuple[typing.Optional[np.ndarray], typing.List]]:
+    # (imputer statistics or None, fitted trees) of a supported model
+    statistics = None
+    if isinstance(model, sklearn.pipeline.Pipeline):
+        preprocessing = [step for _, step in model.steps[:-1] if step not in (None, 'passthrough')]
+        if len(preprocessing) > 1 or (preprocessing and not isinstance(preprocessing[0], Imputer)):
+            return None
+        if preprocessing:
+            statistics = _imputer_statistics(preprocessing[0])
+            if statistics is None:
+                return None
+        model = model.steps[-1][1]
+    if isinstance(model, FOREST_TYPES):
+        trees = list(model.estimators_)
+    elif isinstance(model, TREE_TYPES):
+        trees = [model]
+    else:
+        return None
+    if any(tree.n_outputs_ != 1 for tree in trees):
+        return None
+    return statistics, [tree.tree_ for tree in trees]
+
+
+NODE_DTYPE = np.dtype([('left', np.int32), ('right', np.int32), ('feature', np.int32), ('threshold', np.float32)])
+# a traversal stops early if no path moved in this many levels
+CHECK_EVERY = 4
+
+
+def _float32_thresholds(threshold: np.ndarray) -> np.ndarray:
+    # the largest float32 <= threshold: for float32 x, x <= t iff x <= t32
+    threshold32 = threshold.astype(np.float32)
+    above = threshold32.astype(np.float64) > threshold
+    threshold32[above] = np.nextafter(threshold32[above], np.float32(-np.inf))
+    return threshold32
+
+
+class CompiledForest(object):
+
+    def __init__(self, nodes: np.ndarray, missing_left: np.ndarray, value: np.ndarray, roots: np.ndarray,
+                 group_bounds: np.ndarray, statistics: np.ndarray, max_depth: int):
+        """
+        Groups of fitted sklearn regression trees (e.g., the models of all
+        algorithms) as flat node arrays, so that all groups are predicted in
+        a single vectorized pass. See CompiledForest.from_models.
+
+        The nodes of all trees are stacked as records of NODE_DTYPE, so that
+        a step of a path reads a single record. Children are global node
+        positions; leaves are their own children with an infinite threshold,
+        so paths stay at a leaf once they reach it. The trees of group g are
+        roots[group_bounds[g]:group_bounds[g + 1]], its (imputer) statistics
+        statistics[g] (NaN: no imputation). All members are plain numeric
+        arrays, so they can be memory mapped (see SklearnModelWrapper.load).
+        """
+        self.nodes = nodes
+        self.missing_left = missing_left
+        self.value = value
+        self.roots = roots
+        self.group_bounds = group_bounds
+        self.statistics = statistics
+        self.max_depth = max_depth
+
+    @staticmethod
+    def from_models(models: typing.List) -> typing.Optional['CompiledForest']:
+        """
+        Compiles fitted models, a group each. Supported are (extra) trees and
+        forests of them for regression with a single output, optionally
+        behind an imputer that replaces NaN. Returns None if any model is not
+        supported.
+        """
+        decomposed = [_decompose(model) for model in models]
+        if not decomposed or any(entry is None for entry in decomposed):
+            return None
+        n_features = {tree.n_features for _, trees in decomposed for tree in trees}
+        if len(n_features) != 1:
+            return None
+        n_features = n_features.pop()
+
+        nodes, missing_left, value, roots = [], [], [], []
+        group_bounds, statistics = [0], []
+        offset, max_depth = 0, 0
+        for group_statistics, trees in decomposed:
+            for tree in trees:
+                is_leaf = tree.children_left < 0
+                positions = np.arange(offset, offset + tree.node_count)
+                tree_nodes = np.empty(tree.node_count, dtype=NODE_DTYPE)
+                tree_nodes['left'] = np.where(is_leaf, positions, tree.children_left + offset)
+                tree_nodes['right'] = np.where(is_leaf, positions, tree.children_right + offset)
+                # leaves never read a feature, but should index a valid one
+                tree_nodes['feature'] = np.where(is_leaf, 0, tree.feature)
+                tree_nodes['threshold'] = np.where(is_leaf, np.inf, _float32_thresholds(tree.threshold))
+                nodes.append(tree_nodes)
+                if hasattr(tree, 'missing_go_to_left'):
+                    missing_left.append(np.asarray(tree.missing_go_to_left, dtype=bool) & ~is_leaf)
+                else:
+                    missing_left.append(np.zeros(tree.node_count, dtype=bool))
+                value.append(tree.value[:, 0, 0])
+                roots.append(offset)
+                offset += tree.node_count
+                max_depth = max(max_depth, tree.max_depth)
+            group_bounds.append(len(roots))
+            statistics.append(np.full(n_features, np.nan) if group_statistics is None else group_statistics)
+        if offset > np.iinfo(np.int32).max:
+            return None
+        return CompiledForest(np.concatenate(nodes), np.concatenate(missing_left),
+                              np.concatenate(value).astype(np.float64), np.array(roots, dtype=np.int32),
+                              np.array(group_bounds, dtype=np.intp), np.array(statistics, dtype=np.float64),
+                              max_depth)
+
+    @property
+    def n_groups(self) -> int:
+        return len(self.group_bounds) - 1
+
+    def group(self, idx: int) -> 'CompiledForest':
+        """
+        Returns the trees of a single group; the node arrays are shared
+        """
+        start, end = self.group_bounds[idx], self.group_bounds[idx + 1]
+        return CompiledForest(self.nodes, self.missing_left, self.value, self.roots[start:end], np.array([0, end - start], dtype=np.intp),
+                              self.statistics[idx:idx + 1], self.max_depth)
+
+    def predict_groups(self, X: np.ndarray) -> np.ndarray:
+        """
+        Returns the prediction of every group (columns) for the rows of X.
+        The same as predict of the compiled models: the imputed features are
+        compared as float32 and the trees of a group are averaged in order.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        chunk_size = max(1, CHUNK_SIZE // max(len(self.roots), 1))
+        if len(X) <= chunk_size:
+            return self._predict_chunk(X)
+        return np.concatenate([self._predict_chunk(X[start:start + chunk_size])
+                               for start in range(0, len(X), chunk_size)])
+
+    def _predict_chunk(self, X: np.ndarray) -> np.ndarray:
+        n_groups, n_features = self.statistics.shape
+        # features per group (the imputers differ), as float32 like sklearn
+        grouped_X = np.repeat(X[:, np.newaxis, :], n_groups, axis=1)
+        missing = np.isnan(grouped_X)
+        if missing.any():
+            grouped_X = np.where(missing, self.statistics[np.newaxis, :, :], grouped_X)
+        grouped_X = grouped_X.astype(np.float32).ravel()
+
+        # a path per row and tree, with the position of its features in
+        # grouped_X; all paths take max_depth steps (leaves loop on
+        # themselves), unless none moved in the last CHECK_EVERY steps
+        tree_sizes = np.diff(self.group_bounds)
+        tree_offsets = np.repeat(np.arange(n_groups) * n_features, tree_sizes)
+        offsets = (np.arange(len(X))[:, np.newaxis] * (n_groups * n_features) + tree_offsets).ravel()
+        nodes = np.tile(self.roots, len(X))
+        previous = nodes
+        has_missing = np.isnan(grouped_X).any()
+        for depth in range(1, self.max_depth + 1):
+            records = self.nodes[nodes]
+            values = grouped_X[offsets + records['feature']]
+            go_left = values <= records['threshold']
+            if has_missing:
+                go_left |= np.isnan(values) & self.missing_left[nodes]
+            nodes = np.where(go_left, records['left'], records['right'])
+            if depth % CHECK_EVERY == 0:
+                if np.array_equal(nodes, previous):
+                    break
+                previous = nodes
+
+        # sequential sums, as the forests of sklearn accumulate
+        leaf_values = self.value[nodes].reshape(len(X), len(self.roots))
+        if (tree_sizes == tree_sizes[0]).all():
+            grouped_values = leaf_values.reshape(len(X), n_groups, tree_sizes[0])
+            return np.cumsum(grouped_values, axis=2)[:, :, -1] / tree_sizes[0]
+        result = np.empty((len(X), n_groups), dtype=np.float64)
+        for idx in range(n_groups):
+            start, end = self.group_bounds[idx], self.group_bounds[idx + 1]
+            result[:, idx] = np.cumsum(leaf_values[:, start:end], axis=1)[:, -1] / (end - start)
+        return result
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """
+        Predictions of a single group (as predict of the compiled model)
+        """
+        if self.n_groups != 1:
+            raise ValueError('predict requires a single group, use predict_groups')
+        return self.predict_groups(X)[:, 0]
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import scipy.sparse
+import typing
+
+
+class FrameEncoder(object):
+
+    def __init__(self, categorical: typing.List[str],
+                 ignore: typing.Tuple[str, ...] = ('instance_id', 'objective_function'),
+                 target: str = 'objective_function', sparse: bool = False):
+        """
+        One-hot encodes the categorical columns of a (long) frame and aligns it
+        to the columns seen during fit, in a single pass. The resulting
+        columns are the same (and in the same order) as those of
+        pd.get_dummies(frame, columns=categorical) on the train frame:
+        first the other columns, then a column per category value. Category
+        values that were not seen during fit are ignored, missing columns are
+        zero.
+
+            categorical: list of str
+                columns to one-hot encode
+            ignore: tuple of str
+                columns that are not part of the matrix
+            target: str
+                column that holds y
+            sparse: bool
+                whether transform returns a scipy.sparse csr matrix
+        """
+        self.categorical = list(categorical)
+        self.ignore = tuple(ignore)
+        self.target = target
+        self.sparse = sparse
+        self.numeric_columns = None
+        self.vocabularies = None
+        self.columns = None
+
+    def fit(self, frame: pd.DataFrame) -> 'FrameEncoder':
+        self.numeric_columns = [column for column in frame.columns
+                                if column not in self.categorical and column not in self.ignore]
+        self.vocabularies = {column: sorted(frame[column].dropna().unique()) for column in self.categorical}
+        self.columns = np.array(self.numeric_columns +
+                                ['%s_%s' % (column, value)
+                                 for column in self.categorical for value in self.vocabularies[column]],
+                                dtype=object)
+        return self
+
+    def transform(self, frame: pd.DataFrame) -> typing.Union[np.ndarray, scipy.sparse.csr_matrix]:
+        if self.columns is None:
+            raise ValueError('FrameEncoder is not fitted')
+        numeric = frame.reindex(columns=self.numeric_columns, fill_value=0).to_numpy(dtype=np.float64)
+
+        rows, cols = [], []
+        offset = len(self.numeric_columns)
+        for column in self.categorical:
+            vocabulary = self.vocabularies[column]
+            if column in frame.columns:
+                # -1 for missing values and values not seen during fit
+                codes = pd.Index(vocabulary).get_indexer(frame[column])
+                known = np.flatnonzero(codes >= 0)
+                rows.append(known)
+                cols.append(offset + codes[known].astype(np.int64))
+            offset += len(vocabulary)
+        rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+        cols = np.concatenate(cols) if cols else np.empty(0, dtype=np.int64)
+
+        if self.sparse:
+            n_numeric = len(self.numeric_columns)
+            one_hot = scipy.sparse.csr_matrix((np.ones(len(rows)), (rows, cols - n_numeric)),
+                                              shape=(len(frame), len(self.columns) - n_numeric))
+            return scipy.sparse.hstack([scipy.sparse.csr_matrix(numeric), one_hot], format='csr')
+        X = np.zeros((len(frame), len(self.columns)), dtype=np.float64)
+        X[:, :len(self.numeric_columns)] = numeric
+        X[rows, cols] = 1.0
+        return X
+
+    def fit_transform(self, frame: pd.DataFrame) -> typing.Union[np.ndarray, scipy.sparse.csr_matrix]:
+        return self.fit(frame).transform(frame)
+
+    def transform_target(self, frame: pd.DataFrame) -> np.ndarray:
+        return frame[self.target].to_numpy(dtype=np.float64)
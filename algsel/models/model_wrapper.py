@@ -1,112 +1,363 @@
+import joblib
 import numpy as np
-import pandas as pd
+import os
 import sklearn
+import sklearn.pipeline
+import tempfile
+
+from ..instrumentation import count, timed
+from .compiled import CompiledForest
+from .encoding import FrameEncoder
+from .shared import SharedArrays, attach
+
+
+def _dump_atomic(value, path):
+    # written next to path and moved into place, so that neither readers
+    # (e.g., memory maps of the previous file) nor an interrupted save see a
+    # partially written file
+    fd, tmp_file = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    os.close(fd)
+    try:
+        joblib.dump(value, tmp_file)
+        os.replace(tmp_file, path)
+    except BaseException:
+        os.remove(tmp_file)
+        raise
 
 
 class SklearnModelWrapper:
 
-    def __init__(self, model, single):
+    def __init__(self, model, single, batch_predict=True, n_jobs=None, prefer='threads', keep_training_data=False):
+        """
+        n_jobs and prefer control the pool (joblib semantics) in which the
+        per-algorithm models are fitted in multi-model mode. With
+        prefer='processes', the design matrix is published once in shared
+        memory rather than sent to every worker. keep_training_data keeps the
+        design matrix after fit, which partial_fit (warm start) requires.
+        """
         self.model_template = model
         self.model = None
         self.single = single
-        self.columns = None
+        self.batch_predict = batch_predict
+        self.n_jobs = n_jobs
+        self.prefer = prefer
+        self.keep_training_data = keep_training_data
+        self.encoder = None
+        # design matrix of all rows seen so far (if keep_training_data)
+        self._train_X = None
+        self._train_y = None
+        self._train_algorithms = None
+        # the model(s) as node arrays (see compile), and the file of the
+        # sklearn models of a wrapper loaded with compiled models
+        self._compiled = None
+        self._models_path = None
 
+    @property
+    def columns(self):
+        return None if self.encoder is None else self.encoder.columns
+
+    @timed('models.fit')
     def fit(self, train_dataframe):
         if self.single:
-            self.model, self.columns = self._fit_single_model(train_dataframe, self.model_template)
+            self.model, self.encoder, train_X, train_y, train_algorithms = \
+                self._fit_single_model(train_dataframe, self.model_template)
+        else:
+            self.model, self.encoder, train_X, train_y, train_algorithms = \
+                self._fit_multi_model(train_dataframe, self.model_template, self.n_jobs, self.prefer)
+        if self.keep_training_data:
+            self._train_X, self._train_y, self._train_algorithms = train_X, train_y, train_algorithms
+        else:
+            self._train_X, self._train_y, self._train_algorithms = None, None, None
+        self._compiled = None
+        self._models_path = None
+
+    @timed('models.partial_fit')
+    def partial_fit(self, new_dataframe):
+        """
+        Updates the fitted model(s) with new rows (e.g., newly run instances)
+        instead of refitting on all data, see _refit. In multi-model mode only
+        the models of algorithms that occur in the new rows are updated.
+        Category values that were not seen by fit are ignored. Requires
+        keep_training_data.
+        """
+        if self.model is None:
+            return self.fit(new_dataframe)
+        if self._train_X is None:
+            raise ValueError('partial_fit requires a SklearnModelWrapper with keep_training_data=True')
+        self._load_models()
+        self._compiled = None
+        n_old = len(self._train_X)
+        self._train_X = np.concatenate([self._train_X, self.encoder.transform(new_dataframe)])
+        self._train_y = np.concatenate([self._train_y, self.encoder.transform_target(new_dataframe)])
+        self._train_algorithms = np.concatenate([self._train_algorithms, new_dataframe['algorithm'].to_numpy()])
+
+        if self.single:
+            self.model = self._refit(self.model, self.model_template, self._train_X, self._train_y,
+                                     np.arange(len(self._train_X)), len(self._train_X) - n_old)
+        else:
+            changed = new_dataframe['algorithm'].unique()
+            algorithm_rows = {algorithm_id: np.flatnonzero(self._train_algorithms == algorithm_id)
+                              for algorithm_id in changed}
+            refitted = joblib.Parallel(n_jobs=self.n_jobs, prefer=self.prefer)(
+                joblib.delayed(SklearnModelWrapper._refit)(self.model.get(algorithm_id), self.model_template,
+                                                           self._train_X, self._train_y,
+                                                           algorithm_rows[algorithm_id],
+                                                           int((algorithm_rows[algorithm_id] >= n_old).sum()))
+                for algorithm_id in changed)
+            self.model.update(zip(changed, refitted))
+
+    def compile(self):
+        """
+        Returns the fitted model(s) as a CompiledForest, with a group per
+        algorithm (in the order of self.model) in multi-model mode, or None if
+        the models are not supported (see CompiledForest.from_models)
+        """
+        if self._compiled is None and self.model is not None:
+            self._compiled = CompiledForest.from_models([self.model] if self.single else list(self.model.values()))
+        return self._compiled
+
+    def _load_models(self):
+        # the sklearn models of a wrapper loaded with compiled models
+        if self._models_path is not None:
+            self.model = joblib.load(self._models_path)
+            self._models_path = None
+
+    def save(self, path, include_training_data=False):
+        """
+        Stores the fitted model(s) and the encoder (column vocabulary) in a
+        joblib file, and with include_training_data also the design matrix
+        used by partial_fit (if kept). The sklearn models are stored in
+        path + '.models'. Models that can be compiled (see compile) are also
+        stored as node arrays in path, which load maps into memory; their
+        sklearn models are then only loaded when needed (partial_fit). Both
+        files are replaced atomically.
+        """
+        if self.model is None:
+            raise ValueError('SklearnModelWrapper is not fitted')
+        self._load_models()
+        compiled = self.compile()
+        include_training_data = include_training_data and self._train_X is not None
+        state = {
+            'format_version': 3,
+            'model_template': self.model_template,
+            'compiled': compiled,
+            'algorithms': None if self.single else list(self.model.keys()),
+            'single': self.single,
+            'batch_predict': self.batch_predict,
+            'n_jobs': self.n_jobs,
+            'prefer': self.prefer,
+            'encoder': self.encoder,
+            'train_X': self._train_X if include_training_data else None,
+            'train_y': self._train_y if include_training_data else None,
+            'train_algorithms': self._train_algorithms if include_training_data else None,
+        }
+        _dump_atomic(self.model, path + '.models')
+        _dump_atomic(state, path)
+
+    @staticmethod
+    def load(path, mmap=True):
+        """
+        Loads a model stored by save. With mmap, the numeric arrays of path
+        (the compiled models, the design matrix) are memory mapped read-only,
+        so processes that load the same file share them through the page
+        cache. Compiled models predict like the sklearn models they were
+        compiled from, which are loaded by partial_fit. The sklearn models are
+        never memory mapped, as partial_fit updates them in place (sklearn
+        trees, for instance, copy their nodes when unpickled anyway).
+        """
+        state = joblib.load(path, mmap_mode='r' if mmap else None)
+        if state.get('format_version') not in (1, 2, 3):
+            raise ValueError('Unsupported model file %s' % path)
+        if state.get('model') is not None and mmap:
+            # formats 1 and 2 stored the sklearn models in path
+            state = joblib.load(path)
+        wrapper = SklearnModelWrapper(state['model_template'], state['single'], state['batch_predict'],
+                                      state['n_jobs'], state['prefer'], state['train_X'] is not None)
+        compiled = state.get('compiled')
+        if compiled is None:
+            wrapper.model = state['model'] if state['format_version'] < 3 else joblib.load(path + '.models')
+        elif state['single']:
+            wrapper.model = compiled
         else:
-            self.model, self.columns = self._fit_multi_model(train_dataframe, self.model_template)
+            wrapper.model = {algorithm_id: compiled.group(idx) for idx, algorithm_id in enumerate(state['algorithms'])}
+        wrapper._compiled = compiled
+        wrapper._models_path = None if compiled is None else path + '.models'
+        wrapper.encoder = state['encoder']
+        wrapper._train_X = state['train_X']
+        wrapper._train_y = state['train_y']
+        wrapper._train_algorithms = state['train_algorithms']
+        return wrapper
 
+    @timed('models.predict')
     def predict(self, test_dataframe):
+        count('models.predicted_rows', len(test_dataframe))
         if self.single:
-            return self._predict_single_model(test_dataframe, self.model, self.columns)
+            if self.batch_predict:
+                return self._predict_single_model_batch(test_dataframe, self.model, self.encoder)
+            return self._predict_single_model(test_dataframe, self.model, self.encoder)
         else:
-            return self._predict_multi_model(test_dataframe, self.model, self.columns)
+            return self._predict_multi_model(test_dataframe, self.model, self.encoder)
+
+    @staticmethod
+    def _check_complete_grid(test_dataframe, test_task_ids, algorithms):
+        """
+        Verifies that the test frame contains exactly one row for each
+        combination of instance and algorithm.
+        """
+        if len(test_dataframe) != len(test_task_ids) * len(algorithms):
+            raise ValueError()
+        if test_dataframe.duplicated(['instance_id', 'algorithm']).any():
+            raise ValueError()
+
+    @staticmethod
+    def _fit_pipeline(pipeline, X, y, rows):
+        # rows is a slice (a view of X) or an array of row positions (a copy)
+        pipeline_algorithm = sklearn.base.clone(pipeline)
+        pipeline_algorithm.fit(X[rows], y[rows])
+        return pipeline_algorithm
 
     @staticmethod
-    def _frame_to_X_and_y(frame, original_columns):
-        y = frame['objective_function']
-        frame = frame.drop(['instance_id', 'objective_function'], axis=1)
+    def _refit(model, pipeline, X, y, rows, n_new):
+        """
+        Updates a fitted model with the last n_new of its rows. The fitted
+        preprocessing steps are kept. Estimators that support partial_fit are
+        trained on the new rows only; ensembles that support warm_start grow
+        proportionally to the new rows, fitting only the new members. Other
+        estimators (and models that do not exist yet) are fitted from scratch.
+        """
+        if model is None:
+            return SklearnModelWrapper._fit_pipeline(pipeline, X, y, rows)
+        if isinstance(model, sklearn.pipeline.Pipeline):
+            preprocessing, estimator = model[:-1], model[-1]
+        else:
+            preprocessing, estimator = None, model
 
-        if original_columns is not None:
-            missing_cols = set(original_columns) - set(frame)
-            additional_cols = set(frame) - set(original_columns)
-            for missing in missing_cols:
-                frame.loc[:, missing] = 0
+        def transform(rows_X):
+            return rows_X if preprocessing is None else preprocessing.transform(rows_X)
 
-            for additional in additional_cols:
-                del frame[additional]
-            frame = frame[original_columns]
+        params = estimator.get_params()
+        if hasattr(estimator, 'partial_fit'):
+            new_rows = rows[len(rows) - n_new:]
+            estimator.partial_fit(transform(X[new_rows]), y[new_rows])
+        elif 'warm_start' in params and 'n_estimators' in params:
+            n_additional = int(np.ceil(params['n_estimators'] * n_new / max(len(rows) - n_new, 1)))
+            estimator.set_params(warm_start=True, n_estimators=params['n_estimators'] + max(n_additional, 1))
+            estimator.fit(transform(X[rows]), y[rows])
+        else:
+            return SklearnModelWrapper._fit_pipeline(pipeline, X, y, rows)
+        return model
 
-        return frame.as_matrix(), y.as_matrix(), frame.columns.values
+    @staticmethod
+    def _fit_pipeline_shared(pipeline, handle, rows):
+        with attach(handle) as shared:
+            return SklearnModelWrapper._fit_pipeline(pipeline, shared['X'], shared['y'], rows)
 
     @staticmethod
-    def _fit_multi_model(train_dataframe, pipeline):
+    def _fit_multi_model(train_dataframe, pipeline, n_jobs=None, prefer='threads'):
         algorithms = train_dataframe.algorithm.unique()
-        models = dict()
 
         expected_size = int(len(train_dataframe) / len(algorithms))
 
-        columns = None
-        for algorithm_id in algorithms:
-            train_algorithm = train_dataframe.loc[train_dataframe['algorithm'] == algorithm_id]
-            if len(train_algorithm) != expected_size:
-                raise ValueError('Train frame wrong size. Excepted %d got %d' % (expected_size, len(train_algorithm)))
-            train_X, train_y, curr_columns = SklearnModelWrapper._frame_to_X_and_y(
-                pd.get_dummies(train_algorithm.drop(['algorithm'], axis=1), columns=['step_1']), None)
-            if columns is None:
-                columns = curr_columns
-            else:
-                if not np.array_equal(columns, curr_columns):
-                    raise ValueError()
-            pipeline_algorithm = sklearn.base.clone(pipeline)
-            pipeline_algorithm.fit(train_X, train_y)
-            models[algorithm_id] = pipeline_algorithm
-        return models, columns
+        # all algorithms should have the same (step) columns after encoding
+        algorithm_indices = train_dataframe.groupby('algorithm', sort=False).indices
+        step_values = None
+        for algorithm_id, rows in algorithm_indices.items():
+            if len(rows) != expected_size:
+                raise ValueError('Train frame wrong size. Excepted %d got %d' % (expected_size, len(rows)))
+            curr_step_values = sorted(train_dataframe['step_1'].iloc[rows].dropna().unique())
+            if step_values is None:
+                step_values = curr_step_values
+            elif step_values != curr_step_values:
+                raise ValueError()
+
+        # the matrix is encoded once (ordered by algorithm) and shared by all
+        # fits, each of which gets a contiguous slice of it, i.e., a view
+        train_dataframe = train_dataframe.iloc[np.concatenate([algorithm_indices[algorithm_id]
+                                                               for algorithm_id in algorithms])]
+        algorithm_rows = {algorithm_id: slice(idx * expected_size, (idx + 1) * expected_size)
+                          for idx, algorithm_id in enumerate(algorithms)}
+        encoder = FrameEncoder(['step_1'], ignore=('instance_id', 'objective_function', 'algorithm'))
+        train_X = encoder.fit_transform(train_dataframe)
+        train_y = encoder.transform_target(train_dataframe)
+
+        if prefer != 'processes' or n_jobs in (None, 1):
+            fitted = joblib.Parallel(n_jobs=n_jobs, prefer=prefer)(
+                joblib.delayed(SklearnModelWrapper._fit_pipeline)(pipeline, train_X, train_y,
+                                                                  algorithm_rows[algorithm_id])
+                for algorithm_id in algorithms)
+        else:
+            # workers attach to the published matrix, only the rows are pickled
+            with SharedArrays({'X': train_X, 'y': train_y}) as shared:
+                fitted = joblib.Parallel(n_jobs=n_jobs, prefer=prefer)(
+                    joblib.delayed(SklearnModelWrapper._fit_pipeline_shared)(pipeline, shared.handle,
+                                                                             algorithm_rows[algorithm_id])
+                    for algorithm_id in algorithms)
+        return (dict(zip(algorithms, fitted)), encoder, train_X, train_y,
+                train_dataframe['algorithm'].to_numpy())
 
     @staticmethod
-    def _predict_multi_model(test_dataframe, models, original_columns):
+    def _predict_multi_model(test_dataframe, models, encoder):
         algorithms = test_dataframe.algorithm.unique()
         test_task_ids = test_dataframe.instance_id.unique()
+        SklearnModelWrapper._check_complete_grid(test_dataframe, test_task_ids, algorithms)
 
-        task_algorithm_pred = {task: dict() for task in test_task_ids}
+        algorithm_pred = dict()
+        for algorithm_id, test_algorithm in test_dataframe.groupby('algorithm', sort=False):
+            test_X = encoder.transform(test_algorithm)
+            y_hat = models[algorithm_id].predict(test_X)
+            algorithm_pred[algorithm_id] = dict(zip(test_algorithm['instance_id'].values, y_hat))
 
+        task_algorithm_pred = {task: dict() for task in test_task_ids}
         for task_id in test_task_ids:
-            test_frame = test_dataframe[test_dataframe['instance_id'] == task_id]
-
             for algorithm_id in algorithms:
-                test_algorithm = test_frame.loc[test_frame['algorithm'] == algorithm_id]
-                if len(test_algorithm) != 1:
-                    raise ValueError()
-                test_X, _, _ = SklearnModelWrapper._frame_to_X_and_y(pd.get_dummies(test_algorithm.drop(['algorithm'], axis=1), columns=['step_1']), original_columns)
-                y_hat = models[algorithm_id].predict(test_X)
-
-                task_algorithm_pred[task_id][algorithm_id] = y_hat[0]
+                task_algorithm_pred[task_id][algorithm_id] = algorithm_pred[algorithm_id][task_id]
         return task_algorithm_pred
 
     @staticmethod
     def _fit_single_model(train_dataframe, pipeline):
         model = sklearn.base.clone(pipeline)
-        train_X, train_y, columns = SklearnModelWrapper._frame_to_X_and_y(pd.get_dummies(train_dataframe, columns=['algorithm', 'step_1']), None)
+        encoder = FrameEncoder(['algorithm', 'step_1'])
+        train_X = encoder.fit_transform(train_dataframe)
+        train_y = encoder.transform_target(train_dataframe)
         model.fit(train_X, train_y)
-        return model, columns
+        return model, encoder, train_X, train_y, train_dataframe['algorithm'].to_numpy()
 
     @staticmethod
-    def _predict_single_model(test_dataframe, model, original_columns):
+    def _predict_single_model(test_dataframe, model, encoder):
         algorithms = test_dataframe.algorithm.unique()
         test_task_ids = test_dataframe.instance_id.unique()
 
         task_algorithm_pred = {task: dict() for task in test_task_ids}
 
         for task_id in test_task_ids:
-            test_frame = pd.get_dummies(test_dataframe[test_dataframe['instance_id'] == task_id], columns=['algorithm', 'step_1'])
+            test_frame = test_dataframe[test_dataframe['instance_id'] == task_id]
 
             for algorithm_id in algorithms:
-                test_algorithm = test_frame.loc[test_frame['algorithm_' + str(algorithm_id)] == 1]
+                test_algorithm = test_frame.loc[test_frame['algorithm'] == algorithm_id]
                 if len(test_algorithm) != 1:
                     raise ValueError()
-                test_X, _, _ = SklearnModelWrapper._frame_to_X_and_y(test_algorithm, original_columns)
+                test_X = encoder.transform(test_algorithm)
                 y_hat = model.predict(test_X)
 
                 task_algorithm_pred[task_id][algorithm_id] = y_hat[0]
         return task_algorithm_pred
+
+    @staticmethod
+    def _predict_single_model_batch(test_dataframe, model, encoder):
+        """
+        Same as _predict_single_model, but builds the instance x algorithm
+        design matrix at once and predicts it with a single call.
+        """
+        algorithms = test_dataframe.algorithm.unique()
+        test_task_ids = test_dataframe.instance_id.unique()
+        SklearnModelWrapper._check_complete_grid(test_dataframe, test_task_ids, algorithms)
+
+        test_X = encoder.transform(test_dataframe)
+        y_hat = model.predict(test_X)
+
+        predictions = dict(zip(zip(test_dataframe['instance_id'].values, test_dataframe['algorithm'].values), y_hat))
+        task_algorithm_pred = {task: dict() for task in test_task_ids}
+        for task_id in test_task_ids:
+            for algorithm_id in algorithms:
+                task_algorithm_pred[task_id][algorithm_id] = predictions[(task_id, algorithm_id)]
+        return task_algorithm_pred
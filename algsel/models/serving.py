@@ -0,0 +1,158 @@
+import http.server
+import json
+import numpy as np
+import sys
+import typing
+
+from .model_wrapper import SklearnModelWrapper
+
+
+class Selector(object):
+
+    def __init__(self, wrapper: SklearnModelWrapper, maximize: bool = False):
+        """
+        Selects algorithms for instances given as plain feature vectors, using
+        a fitted SklearnModelWrapper. The design matrix of all algorithms is
+        prepared once, so a selection only fills in the features and
+        predicts. Models that can be compiled (see SklearnModelWrapper.compile)
+        predict all algorithms in a single pass, others call predict once in
+        single-model mode and once per algorithm otherwise.
+
+            wrapper: SklearnModelWrapper
+                fitted model
+            maximize: bool
+                whether the algorithm with the highest (rather than the
+                lowest) predicted objective is selected
+        """
+        if wrapper.model is None:
+            raise ValueError('SklearnModelWrapper is not fitted')
+        self.wrapper = wrapper
+        self.maximize = maximize
+        self._compiled = wrapper.compile()
+        encoder = wrapper.encoder
+        # numeric columns of the encoder except the repetition, i.e., the
+        # expected feature vector
+        self.feature_names = [name for name in encoder.numeric_columns if name != 'repetition']
+        self._feature_positions = np.array([idx for idx, name in enumerate(encoder.numeric_columns)
+                                            if name != 'repetition'], dtype=np.intp)
+        self.step_values = list(encoder.vocabularies['step_1'])
+        self._step_offset = len(encoder.columns) - len(self.step_values)
+
+        n_numeric = len(encoder.numeric_columns)
+        if wrapper.single:
+            self.algorithms = list(encoder.vocabularies['algorithm'])
+            # one row per algorithm, with its one-hot column set
+            self._template = np.zeros((len(self.algorithms), len(encoder.columns)), dtype=np.float64)
+            self._template[np.arange(len(self.algorithms)), n_numeric + np.arange(len(self.algorithms))] = 1.0
+        else:
+            self.algorithms = list(wrapper.model.keys())
+            self._template = np.zeros((1, len(encoder.columns)), dtype=np.float64)
+        if 'repetition' in encoder.numeric_columns:
+            # instances are selected for (as in) their first repetition
+            self._template[:, encoder.numeric_columns.index('repetition')] = 1.0
+
+    def _design_matrix(self, features: np.ndarray, step: typing.Optional[str]) -> np.ndarray:
+        X = np.repeat(self._template[np.newaxis, :, :], len(features), axis=0)
+        X[:, :, self._feature_positions] = features[:, np.newaxis, :]
+        if step is not None and step in self.step_values:
+            X[:, :, self._step_offset + self.step_values.index(step)] = 1.0
+        return X.reshape(-1, X.shape[2])
+
+    def scores(self, features: typing.Union[np.ndarray, typing.List[float]],
+               step: typing.Optional[str] = None) -> np.ndarray:
+        """
+        Returns the predicted objective of every algorithm (columns, in the
+        order of self.algorithms) for a batch of feature vectors (rows).
+
+            features: array of shape (n_features, ) or (n_instances, n_features)
+                in the order of self.feature_names, NaN for missing values
+            step: str
+                value of step_1 (feature step status) of the instances
+        """
+        features = np.atleast_2d(np.asarray(features, dtype=np.float64))
+        if features.shape[1] != len(self.feature_names):
+            raise ValueError('Expected %d features, got %d' % (len(self.feature_names), features.shape[1]))
+        X = self._design_matrix(features, step)
+        if self._compiled is not None:
+            if self.wrapper.single:
+                return self._compiled.predict_groups(X)[:, 0].reshape(len(features), len(self.algorithms))
+            return self._compiled.predict_groups(X)
+        if self.wrapper.single:
+            return self.wrapper.model.predict(X).reshape(len(features), len(self.algorithms))
+        return np.column_stack([self.wrapper.model[algorithm].predict(X) for algorithm in self.algorithms])
+
+    def select(self, features: typing.Union[np.ndarray, typing.List[float]],
+               step: typing.Optional[str] = None) -> typing.Tuple[typing.Any, np.ndarray]:
+        """
+        Returns the selected algorithm and the scores of all algorithms. For a
+        batch of feature vectors, returns a list of algorithms and a matrix
+        of scores.
+        """
+        scores = self.scores(features, step)
+        best = scores.argmax(axis=1) if self.maximize else scores.argmin(axis=1)
+        selected = [self.algorithms[idx] for idx in best]
+        if np.ndim(features) == 1:
+            return selected[0], scores[0]
+        return selected, scores
+
+    def handle_request(self, request: typing.Dict) -> typing.Dict:
+        """
+        Answers a JSON request {"features": [...] or {name: value}, "step": str}
+        with {"algorithm": str, "scores": {algorithm: score}}
+        """
+        features = request['features']
+        if isinstance(features, dict):
+            features = [features.get(name) for name in self.feature_names]
+        selected, scores = self.select(features, request.get('step'))
+        return {'algorithm': selected, 'scores': dict(zip(self.algorithms, scores.tolist()))}
+
+
+def serve_stdio(selector: Selector, stdin: typing.Optional[typing.TextIO] = None,
+                stdout: typing.Optional[typing.TextIO] = None) -> None:
+    """
+    Reads a JSON request per line from stdin and writes a JSON response per
+    line to stdout (errors as {"error": message}). Defaults to the current
+    sys.stdin / sys.stdout.
+    """
+    stdin = sys.stdin if stdin is None else stdin
+    stdout = sys.stdout if stdout is None else stdout
+    for line in stdin:
+        if not line.strip():
+            continue
+        try:
+            response = selector.handle_request(json.loads(line))
+        except (ValueError, KeyError, TypeError) as e:
+            response = {'error': str(e)}
+        stdout.write(json.dumps(response) + '\n')
+        stdout.flush()
+
+
+def serve_http(selector: Selector, host: str = '127.0.0.1', port: int = 8080) -> None:
+    """
+    Serves POST /select requests (JSON body, see Selector.handle_request) until
+    interrupted
+    """
+    class SelectHandler(http.server.BaseHTTPRequestHandler):
+
+        def _respond(self, code: int, body: typing.Dict) -> None:
+            content = json.dumps(body).encode('utf-8')
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def do_POST(self):
+            if self.path != '/select':
+                return self._respond(404, {'error': 'unknown path %s' % self.path})
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                self._respond(200, selector.handle_request(request))
+            except (ValueError, KeyError, TypeError) as e:
+                self._respond(400, {'error': str(e)})
+
+        def log_message(self, format, *args):
+            pass
+
+    with http.server.ThreadingHTTPServer((host, port), SelectHandler) as server:
+        server.serve_forever()
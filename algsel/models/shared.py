@@ -0,0 +1,132 @@
+import numpy as np
+import sys
+import threading
+import typing
+import weakref
+
+from multiprocessing import resource_tracker, shared_memory
+
+
+class SharedArraysHandle(typing.NamedTuple):
+    """
+    Picklable reference to published arrays: the name of the shared memory
+    segment and (name, dtype, shape, offset) per array
+    """
+    segment: str
+    arrays: typing.Tuple[typing.Tuple[str, str, typing.Tuple[int, ...], int], ...]
+
+
+# serializes the (pre 3.13) patch of resource_tracker.register, so that
+# concurrent attaches never save and restore each other's patch
+_attach_lock = threading.Lock()
+
+
+def _attach_segment(name: str) -> shared_memory.SharedMemory:
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    # an attached segment should not be registered with the resource tracker,
+    # otherwise it is unlinked as soon as the worker exits (bpo-39959).
+    # Unregistering after the fact is not an option: a forked worker shares
+    # the tracker of the owner, whose registration would be dropped as well.
+    # The patch only covers the construction of the segment.
+    with _attach_lock:
+        register = resource_tracker.register
+        resource_tracker.register = lambda *args, **kwargs: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+def _release(segment: shared_memory.SharedMemory, unlink: bool) -> None:
+    try:
+        segment.close()
+    except BufferError:
+        pass  # views still exist, the mapping goes away with them
+    if unlink:
+        try:
+            segment.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class AttachedArrays(object):
+
+    def __init__(self, handle: SharedArraysHandle):
+        """
+        Read-only, zero-copy views on arrays published by SharedArrays (used
+        in worker processes). Should be closed (or used as context manager)
+        once the arrays are not needed anymore.
+        """
+        self._segment = _attach_segment(handle.segment)
+        self._finalizer = weakref.finalize(self, _release, self._segment, False)
+        self.arrays = dict()
+        for name, dtype, shape, offset in handle.arrays:
+            array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=self._segment.buf, offset=offset)
+            array.flags.writeable = False
+            self.arrays[name] = array
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.arrays[name]
+
+    def close(self) -> None:
+        # views should not outlive the mapping
+        self.arrays = dict()
+        self._finalizer()
+
+    def __enter__(self) -> 'AttachedArrays':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class SharedArrays(object):
+
+    def __init__(self, arrays: typing.Dict[str, np.ndarray]):
+        """
+        Publishes numeric arrays (e.g., the X and y of a training frame) once in
+        a shared memory segment, so worker processes can attach to them instead
+        of receiving a pickled copy each.
+
+        The creating process owns the segment: it is unlinked on close(), when
+        leaving the context or when this object is garbage collected. Workers
+        never unlink, so a crashing worker does not affect the others. If the
+        owner itself dies, the resource tracker of multiprocessing removes the
+        segment.
+        """
+        layout = []
+        size = 0
+        for name, array in arrays.items():
+            array = np.asarray(array)
+            if array.dtype.hasobject:
+                raise ValueError('Can not share array %s of dtype object' % name)
+            offset = -(-size // 64) * 64  # aligned
+            layout.append((name, array, offset))
+            size = offset + array.nbytes
+
+        self._segment = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        self._finalizer = weakref.finalize(self, _release, self._segment, True)
+        handle_arrays = []
+        for name, array, offset in layout:
+            target = np.ndarray(array.shape, dtype=array.dtype, buffer=self._segment.buf, offset=offset)
+            target[...] = array
+            del target
+            handle_arrays.append((name, array.dtype.str, array.shape, offset))
+        self.handle = SharedArraysHandle(self._segment.name, tuple(handle_arrays))
+
+    def close(self) -> None:
+        self._finalizer()
+
+    def __enter__(self) -> 'SharedArrays':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def attach(handle: SharedArraysHandle) -> AttachedArrays:
+    """
+    Attaches to arrays published by SharedArrays
+    """
+    return AttachedArrays(handle)
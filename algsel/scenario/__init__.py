@@ -1,2 +1,6 @@
+from .arff_reader import *
+from .arff_writer import *
+from .cache import *
 from .general import *
+from .loader import *
 from .oasc import *
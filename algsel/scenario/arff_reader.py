@@ -0,0 +1,168 @@
+import numpy as np
+import pandas as pd
+import typing
+
+from ..instrumentation import timed
+
+
+NUMERIC_TYPES = ('NUMERIC', 'REAL', 'INTEGER')
+# characters escaped within quotes (as by liac-arff), others stand for themselves
+_ESCAPES = {'n': '\n', 'r': '\r', 't': '\t'}
+
+
+def _split_quoted(line: str) -> typing.List[typing.Optional[str]]:
+    """
+    Splits a data line that contains quoted values (with backslash escapes).
+    Only an unquoted ? is a missing value (None), '?' is the string ?.
+    """
+    values = []
+    idx, length = 0, len(line)
+    while idx <= length:
+        while idx < length and line[idx] in ' \t':
+            idx += 1
+        if idx < length and line[idx] in '\'"':
+            quote = line[idx]
+            idx += 1
+            chars = []
+            while idx < length and line[idx] != quote:
+                if line[idx] == '\\' and idx + 1 < length:
+                    idx += 1
+                    chars.append(_ESCAPES.get(line[idx], line[idx]))
+                else:
+                    chars.append(line[idx])
+                idx += 1
+            values.append(''.join(chars))
+            comma = line.find(',', idx)
+            idx = length + 1 if comma == -1 else comma + 1
+        else:
+            comma = line.find(',', idx)
+            end = length if comma == -1 else comma
+            value = line[idx:end].strip()
+            values.append(None if value == '?' else value)
+            idx = end + 1
+    return values
+
+
+def _split_line(line: str) -> typing.List[typing.Optional[str]]:
+    """
+    Splits a data line into its values, missing values (?) are None
+    """
+    if '\'' in line or '"' in line:
+        return _split_quoted(line)
+    values = [value.strip() for value in line.split(',')]
+    if '?' in line:
+        values = [None if value == '?' else value for value in values]
+    return values
+
+
+def _parse_attribute(line: str) -> typing.Tuple[str, typing.Union[str, typing.List[str]]]:
+    definition = line[len('@attribute'):].strip()
+    if definition[0] in '\'"':
+        end = definition.index(definition[0], 1)
+        name, column_type = definition[1:end], definition[end + 1:].strip()
+    else:
+        name, column_type = definition.split(None, 1)
+        column_type = column_type.strip()
+    if column_type.startswith('{'):
+        return name, _split_line(column_type[1:column_type.rindex('}')])
+    keyword = column_type.split()[0].upper()
+    if keyword == 'DATE':
+        # the (optional) date format is kept, e.g., DATE "yyyy-MM-dd"; the
+        # values are read as strings
+        return name, keyword + column_type[len(keyword):]
+    return name, keyword
+
+
+def read_arff_header(fp: typing.TextIO) -> typing.Tuple[str, typing.List]:
+    """
+    Reads the header of an arff file, up to and including the @data line.
+    Returns the relation name and the attributes (liac-arff format).
+    """
+    relation = None
+    attributes = []
+    for line in fp:
+        line = line.strip()
+        if not line or line.startswith('%'):
+            continue
+        keyword = line.split(None, 1)[0].lower()
+        if keyword == '@relation':
+            relation = line.split(None, 1)[1].strip().strip('\'"')
+        elif keyword == '@attribute':
+            attributes.append(_parse_attribute(line))
+        elif keyword == '@data':
+            return relation, attributes
+        else:
+            raise ValueError('Unexpected line in arff header: %s' % line)
+    raise ValueError('No @data section found')
+
+
+def _to_column_buffer(values: typing.Sequence[typing.Optional[str]], column_type) -> np.ndarray:
+    if isinstance(column_type, str) and column_type in NUMERIC_TYPES:
+        if None in values:
+            values = ['nan' if value is None else value for value in values]
+        return np.array(values, dtype=str).astype(np.float64)
+    return np.array(values, dtype=object)
+
+
+@timed('scenario.read_arff')
+def read_arff(filepath: str, columns: typing.Optional[typing.Iterable[str]] = None, chunk_size: int = 100000) \
+        -> typing.Tuple[pd.DataFrame, typing.List]:
+    """
+    Reads an arff file into a dataframe without materializing the whole file
+    as Python objects. Data rows are parsed in chunks into typed NumPy column
+    buffers: numeric attributes become float columns (integer attributes int
+    columns if they have no missing values), nominal and string attributes
+    object columns (as are date attributes, whose format is kept in the
+    attributes). Only unquoted ? are missing values. Optionally only a subset
+    of columns is materialized.
+    Returns the frame and its attributes. Sparse arff is not supported.
+    """
+    with open(filepath) as fp:
+        _, attributes = read_arff_header(fp)
+        names = [att[0] for att in attributes]
+        if columns is None:
+            selected = list(range(len(attributes)))
+        else:
+            columns = set(columns)
+            missing = columns - set(names)
+            if missing:
+                raise ValueError('Columns not in %s: %s' % (filepath, sorted(missing)))
+            selected = [idx for idx, name in enumerate(names) if name in columns]
+
+        buffers = {idx: [] for idx in selected}
+        rows = []
+
+        def flush():
+            if not rows:
+                return
+            if any(len(row) != len(attributes) for row in rows):
+                raise ValueError('Data row with wrong number of values in %s' % filepath)
+            row_columns = list(zip(*rows))
+            for idx in selected:
+                buffers[idx].append(_to_column_buffer(row_columns[idx], attributes[idx][1]))
+            del rows[:]
+
+        for line in fp:
+            line = line.strip()
+            if not line or line.startswith('%'):
+                continue
+            if line.startswith('{'):
+                raise ValueError('Sparse arff is not supported: %s' % filepath)
+            rows.append(_split_line(line))
+            if len(rows) >= chunk_size:
+                flush()
+        flush()
+
+    frame_columns = dict()
+    for idx in selected:
+        column_type = attributes[idx][1]
+        if buffers[idx]:
+            values = np.concatenate(buffers[idx])
+        else:
+            values = np.array([], dtype=np.float64 if column_type in NUMERIC_TYPES else object)
+        if column_type == 'INTEGER' and not np.isnan(values).any():
+            values = values.astype(np.int64)
+        frame_columns[names[idx]] = values
+        buffers[idx] = None
+    selected_names = [names[idx] for idx in selected]
+    return pd.DataFrame(frame_columns, columns=selected_names), [attributes[idx] for idx in selected]
@@ -0,0 +1,75 @@
+import pandas as pd
+import typing
+
+
+_QUOTE_PATTERN = r'[\s\'"\\%,{}?]'
+# escaped within quotes (as liac-arff does), a value is always a single line
+_ESCAPES = [('\\', '\\\\'), ('\'', '\\\''), ('\n', '\\n'), ('\r', '\\r')]
+
+
+def _quote(values: pd.Series) -> pd.Series:
+    needs_quotes = values.str.contains(_QUOTE_PATTERN, regex=True) | (values == '')
+    escaped = values
+    for char, escape in _ESCAPES:
+        escaped = escaped.str.replace(char, escape, regex=False)
+    return values.where(~needs_quotes, '\'' + escaped + '\'')
+
+
+def _format_column(values: pd.Series) -> pd.Series:
+    missing = values.isna().to_numpy()
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        formatted = pd.Series(values.to_numpy().astype(str), index=values.index, dtype=object)
+    else:
+        formatted = _quote(values.where(~missing, '').astype(str).astype(object))
+    formatted[missing] = '?'
+    return formatted
+
+
+def _format_attribute(name: str, column_type) -> str:
+    name = _quote(pd.Series([name], dtype=object))[0]
+    if isinstance(column_type, str):
+        return '@ATTRIBUTE %s %s' % (name, column_type)
+    values = _quote(pd.Series([str(value) for value in column_type], dtype=object))
+    return '@ATTRIBUTE %s {%s}' % (name, ', '.join(values))
+
+
+def infer_attributes(frame: pd.DataFrame) -> typing.List:
+    """
+    Deduces arff attributes from the dtypes of a frame: numeric columns
+    become NUMERIC, all others STRING.
+    """
+    attributes = []
+    for column in frame.columns:
+        if pd.api.types.is_numeric_dtype(frame[column]) and not pd.api.types.is_bool_dtype(frame[column]):
+            attributes.append((column, 'NUMERIC'))
+        else:
+            attributes.append((column, 'STRING'))
+    return attributes
+
+
+def write_arff(frame: pd.DataFrame, relation: str, filepath: str,
+               attributes: typing.Optional[typing.List] = None, chunk_size: int = 100000) -> None:
+    """
+    Writes a frame to an arff file. Values are formatted per column (not per
+    cell) and written in bulk, chunk_size rows at a time. If attributes are
+    given (liac-arff format, e.g., as obtained from read_arff), the frame
+    columns are written in that order, otherwise the attributes are inferred.
+    """
+    if attributes is None:
+        attributes = infer_attributes(frame)
+    frame = frame[[att[0] for att in attributes]]
+
+    with open(filepath, 'w', buffering=1 << 20) as fp:
+        fp.write('@RELATION %s\n\n' % _quote(pd.Series([relation], dtype=object))[0])
+        for name, column_type in attributes:
+            fp.write(_format_attribute(name, column_type) + '\n')
+        fp.write('\n@DATA\n')
+
+        for start in range(0, len(frame), chunk_size):
+            chunk = frame.iloc[start:start + chunk_size]
+            columns = [_format_column(chunk[column]) for column in chunk.columns]
+            if not columns:
+                continue
+            lines = columns[0].str.cat(columns[1:], sep=',') if len(columns) > 1 else columns[0]
+            fp.write('\n'.join(lines.tolist()))
+            fp.write('\n')
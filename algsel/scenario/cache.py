@@ -0,0 +1,104 @@
+import hashlib
+import json
+import logging
+import numpy as np
+import os
+import pandas as pd
+import tempfile
+import typing
+import zipfile
+
+from ..instrumentation import count
+from .arff_reader import read_arff
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'algsel', 'arff')
+# part of every cache key: bump whenever read_arff or the cache format
+# changes the resulting frames (values, dtypes, attributes)
+CACHE_FORMAT_VERSION = 4
+# files smaller than this (bytes) are parsed faster than read from the cache
+MIN_CACHE_SIZE = 32 * 1024
+
+
+def get_cache_dir() -> str:
+    """
+    Returns the directory in which parsed arff files are cached. Can be
+    overridden with the ALGSEL_CACHE_DIR environment variable.
+    """
+    return os.environ.get('ALGSEL_CACHE_DIR', DEFAULT_CACHE_DIR)
+
+
+def _cache_key(filepath: str, columns: typing.Optional[typing.Iterable[str]]) -> str:
+    stat = os.stat(filepath)
+    key = '%d:%s:%d:%d' % (CACHE_FORMAT_VERSION, os.path.abspath(filepath), stat.st_mtime_ns, stat.st_size)
+    if columns is not None:
+        key += ':' + ','.join(sorted(columns))
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def _write_cache(cache_file: str, frame: pd.DataFrame, attributes: typing.List) -> None:
+    arrays = dict()
+    for idx, column in enumerate(frame.columns):
+        values = frame[column]
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            arrays['c%d' % idx] = values.to_numpy()
+        else:
+            mask = values.isna().to_numpy()
+            arrays['c%d' % idx] = values.where(~mask, '').astype(str).to_numpy(dtype=str)
+            arrays['m%d' % idx] = mask
+    arrays['meta'] = np.array(json.dumps({'attributes': attributes}))
+
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    fd, tmp_file = tempfile.mkstemp(dir=os.path.dirname(cache_file), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as fp:
+            np.savez(fp, **arrays)
+        os.replace(tmp_file, cache_file)
+    except BaseException:
+        os.remove(tmp_file)
+        raise
+
+
+def _read_cache(cache_file: str) -> typing.Tuple[pd.DataFrame, typing.List]:
+    with np.load(cache_file, allow_pickle=False) as data:
+        attributes = [tuple(att) for att in json.loads(str(data['meta']))['attributes']]
+        columns = dict()
+        for idx, (column, _) in enumerate(attributes):
+            values = data['c%d' % idx]
+            if 'm%d' % idx in data:
+                values = values.astype(object)
+                values[data['m%d' % idx]] = None
+            columns[column] = values
+    return pd.DataFrame(columns, columns=[att[0] for att in attributes]), attributes
+
+
+def load_arff_frame(filepath: str, use_cache: bool = True, cache_dir: typing.Optional[str] = None,
+                    columns: typing.Optional[typing.Iterable[str]] = None) \
+        -> typing.Tuple[pd.DataFrame, typing.List]:
+    """
+    Loads an arff file (or a subset of its columns) as a dataframe, together
+    with its attributes (see read_arff). Parsed files are stored in a binary
+    columnar cache, keyed by path, modification time and size, so repeated
+    loads skip the arff parser. Files smaller than MIN_CACHE_SIZE are always
+    parsed.
+    """
+    if not use_cache or os.path.getsize(filepath) < MIN_CACHE_SIZE:
+        count('arff.parsed')
+        return read_arff(filepath, columns)
+
+    cache_file = os.path.join(cache_dir or get_cache_dir(), '%s.npz' % _cache_key(filepath, columns))
+    if os.path.isfile(cache_file):
+        try:
+            result = _read_cache(cache_file)
+            count('arff.cache_hits')
+            return result
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            logging.warning('Could not read cache file %s for %s, parsing again' % (cache_file, filepath))
+
+    count('arff.parsed')
+    frame, attributes = read_arff(filepath, columns)
+    try:
+        _write_cache(cache_file, frame, attributes)
+    except OSError as e:
+        logging.warning('Could not write cache file %s: %s' % (cache_file, e))
+    return frame, attributes
@@ -1,90 +1,240 @@
-import arff
+import functools
 import logging
-import openmlcontrib
+import numpy as np
 import os
-
 import pandas as pd
+import typing
+
+from ..instrumentation import timed
+from .arff_reader import read_arff_header
+from .cache import load_arff_frame
+
+
+def _join_evaluations(evaluations: pd.DataFrame, features: pd.DataFrame, objective_function: str) -> pd.DataFrame:
+    evaluations = evaluations.set_index(['instance_id', 'repetition'])
+
+     # merge
+    evaluations = evaluations.join(features).reset_index()
+    evaluations = evaluations.reindex(sorted(evaluations.columns), axis=1)
+    evaluations = evaluations.rename(index=str, columns={objective_function: 'objective_function'})
 
+    # sort columns
+    evaluations = evaluations[sorted(evaluations.columns.values)]
 
-def obtain_dataframe_scenario(meta_features_path: str, evaluations_path: str, feature_status_path: str):
+    # sort rows and return
+    return evaluations.sort_values(['instance_id', 'algorithm']).reset_index().drop('index', axis=1)
+
+
+def _deduce_objective_function(evaluations_columns: typing.Iterable[str]) -> str:
+    candidates = set(evaluations_columns) - {'instance_id', 'repetition', 'algorithm', 'runstatus'}
+    if len(candidates) == 0:
+        raise ValueError('No candidate for objective_function')
+    elif len(candidates) > 1:
+        raise ValueError('Multiple candidate for objective_function')
+    return list(candidates)[0]
+
+
+class WideScenario(object):
+
+    def __init__(self, features: pd.DataFrame, performance: pd.DataFrame, runstatus: typing.Optional[pd.DataFrame],
+                 observed: np.ndarray, objective_function: str):
+        """
+        Compact representation of a scenario. Holds the features (joined with
+        the feature status) once per (instance_id, repetition), and dense
+        (instance_id, repetition) x algorithm matrices with the performance
+        and the runstatus of the algorithm runs. Observed marks which cells
+        have a run in the scenario.
+        """
+        self.features = features
+        self.performance = performance
+        self.runstatus = runstatus
+        self.observed = observed
+        self.objective_function = objective_function
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Builds the long frame, as returned by obtain_dataframe_scenario
+        """
+        rows, columns = np.nonzero(self.observed)
+        evaluations = pd.DataFrame({
+            'instance_id': self.performance.index.get_level_values('instance_id')[rows],
+            'algorithm': self.performance.columns[columns],
+            'repetition': self.performance.index.get_level_values('repetition')[rows],
+            self.objective_function: self.performance.to_numpy()[rows, columns].astype(np.float64),
+        })
+        return _join_evaluations(evaluations, self.features, self.objective_function)
+
+
+def _evaluations_to_wide(evaluations: pd.DataFrame, features: pd.DataFrame, objective_function: str,
+                         performance_dtype) -> WideScenario:
+    row_codes, rows = pd.MultiIndex.from_arrays([evaluations['instance_id'], evaluations['repetition']]).factorize()
+    rows = rows.set_names(['instance_id', 'repetition'])
+    column_codes, algorithms = pd.factorize(evaluations['algorithm'], sort=True)
+    shape = (len(rows), len(algorithms))
+    algorithms = pd.Index(algorithms, name='algorithm')
+
+    observed = np.zeros(shape, dtype=bool)
+    observed[row_codes, column_codes] = True
+    if observed.sum() != len(evaluations):
+        raise ValueError('Multiple runs for the same instance, repetition and algorithm')
+
+    performance = np.full(shape, np.nan, dtype=performance_dtype)
+    performance[row_codes, column_codes] = evaluations[objective_function].to_numpy()
+    performance = pd.DataFrame(performance, index=rows, columns=algorithms)
+
+    runstatus = None
+    if 'runstatus' in evaluations.columns:
+        runstatus = np.full(shape, None, dtype=object)
+        runstatus[row_codes, column_codes] = evaluations['runstatus'].to_numpy(dtype=object)
+        runstatus = pd.DataFrame(runstatus, index=rows, columns=algorithms)
+
+    return WideScenario(features, performance, runstatus, observed, objective_function)
+
+
+@timed('scenario.obtain_dataframe_scenario')
+def obtain_dataframe_scenario(meta_features_path: str, evaluations_path: str, feature_status_path: str,
+                              use_cache: bool = True, wide: bool = False, performance_dtype=np.float64) \
+        -> typing.Union[pd.DataFrame, WideScenario]:
     """
     Loads the scenario files and returns a dataframe with (meta)-features and
-    evaluations joined.
+    evaluations joined. If wide is set, returns a WideScenario instead, which
+    does not repeat the features for every algorithm (the long frame can be
+    obtained with WideScenario.to_frame). In that case performance_dtype
+    determines the dtype of the performance matrix (e.g., np.float32).
     """
-    run_cols = {'instance_id', 'repetition', 'algorithm', 'runstatus'}
-
     # load features
-    features_arff = arff.load(open(meta_features_path))
-    features_columns = [att[0] for att in features_arff['attributes']]
-    features = pd.DataFrame(features_arff['data'], columns=features_columns)
+    features, _ = load_arff_frame(meta_features_path, use_cache)
     features = features.set_index(['instance_id', 'repetition'])
 
     # load feature status
-    feature_status_arff = arff.load(open(feature_status_path))
-    feature_status_columns = [att[0] for att in feature_status_arff['attributes']]
-    feature_status = pd.DataFrame(feature_status_arff['data'], columns=feature_status_columns)
+    feature_status, _ = load_arff_frame(feature_status_path, use_cache)
     feature_status = feature_status.set_index(['instance_id', 'repetition'])
 
     # merge feature with feature status
     features = features.join(feature_status)
 
-    # load evaluations
-    evaluations_arff = arff.load(open(evaluations_path))
-    evaluations_columns = [att[0] for att in evaluations_arff['attributes']]
+    # load evaluations (header only, the columns are deduced from it)
+    with open(evaluations_path) as fp:
+        _, evaluations_attributes = read_arff_header(fp)
+    evaluations_columns = [att[0] for att in evaluations_attributes]
 
     # deduce objective function (based on evaluation columns)
-    candidates = set(evaluations_columns) - run_cols
-    if len(candidates) == 0:
-        raise ValueError('No candidate for objective_function')
-    elif len(candidates) > 1:
-        raise ValueError('Multiple candidate for objective_function')
-    objective_function = list(candidates)[0]
+    objective_function = _deduce_objective_function(evaluations_columns)
 
     # further pre-process evaluations
     relevant_fields = ['instance_id', 'algorithm', 'repetition', objective_function]
-    evaluations = pd.DataFrame(evaluations_arff['data'], columns=evaluations_columns)[relevant_fields]
-    evaluations = evaluations.set_index(['instance_id', 'repetition'])
+    if wide:
+        if 'runstatus' in evaluations_columns:
+            relevant_fields.append('runstatus')
+        evaluations, _ = load_arff_frame(evaluations_path, use_cache, columns=relevant_fields)
+        return _evaluations_to_wide(evaluations, features, objective_function, performance_dtype)
 
-     # merge
-    evaluations = evaluations.join(features).reset_index()
-    evaluations = evaluations.reindex(sorted(evaluations.columns), axis=1)
-    evaluations = evaluations.rename(index=str, columns={objective_function: 'objective_function'})
+    evaluations, _ = load_arff_frame(evaluations_path, use_cache, columns=relevant_fields)
+    evaluations = evaluations[relevant_fields]
+    return _join_evaluations(evaluations, features, objective_function)
 
-    # sort columns
-    evaluations = evaluations[sorted(evaluations.columns.values)]
 
-    # sort rows and return
-    return evaluations.sort_values(['instance_id', 'algorithm']).reset_index().drop('index', axis=1)
+class CVScenario(object):
+
+    result_types = ('algorithm_runs', 'feature_costs', 'feature_runstatus', 'feature_values')
+
+    def __init__(self, scenario_folder: str, use_cache: bool = True):
+        """
+        Parses the cross-validation file and the data files of a scenario
+        folder once, so that the train and test set of every repetition / fold
+        can be derived from memory.
+        """
+        self.scenario_folder = scenario_folder
+
+        cv_frame, _ = load_arff_frame(os.path.join(scenario_folder, 'cv.arff'), use_cache)
+        # index: repetition -> (instance_id -> fold)
+        self.instance_folds = {
+            repetition: group.set_index('instance_id')['fold']
+            for repetition, group in cv_frame.groupby('repetition')
+        }
+
+        self.frames = dict()
+        self.attributes = dict()
+        for file_type in self.result_types:
+            filepath = os.path.join(scenario_folder, '%s.arff' % file_type)
+            if not os.path.isfile(filepath):
+                logging.warning('Scenario folder %s does not have file type: %s' % (scenario_folder, file_type))
+                self.frames[file_type] = None
+                self.attributes[file_type] = None
+                continue
+            self.frames[file_type], self.attributes[file_type] = load_arff_frame(filepath, use_cache)
+
+        # (file_type, repetition) -> row positions ordered by fold, and the
+        # (start, end) of each fold in that order
+        self._fold_positions = dict()
+        # content hashes of fold exports, see algsel.scenario.oasc
+        self._content_hashes = dict()
+
+    def _get_fold_positions(self, file_type: str, repetition: int) \
+            -> typing.Tuple[np.ndarray, typing.Dict[int, typing.Tuple[int, int]]]:
+        key = (file_type, repetition)
+        if key not in self._fold_positions:
+            if repetition in self.instance_folds:
+                instance_folds = self.instance_folds[repetition]
+                row_folds = self.frames[file_type]['instance_id'].map(instance_folds).to_numpy(dtype=np.float64)
+            else:
+                row_folds = np.full(len(self.frames[file_type]), np.nan)
+            # stable, so the rows of a fold stay in file order
+            order = np.argsort(row_folds, kind='stable')
+            folds, starts, sizes = np.unique(row_folds[order], return_index=True, return_counts=True)
+            bounds = {int(fold): (int(start), int(start + size))
+                      for fold, start, size in zip(folds, starts, sizes) if not np.isnan(fold)}
+            self._fold_positions[key] = (order, bounds)
+        return self._fold_positions[key]
+
+    def _get_rows(self, file_type: str, test_set: bool, repetition: int, fold: int) -> np.ndarray:
+        order, bounds = self._get_fold_positions(file_type, repetition)
+        start, end = bounds.get(fold, (0, 0))
+        test_rows = order[start:end]
+        if test_set:
+            return test_rows
+        return np.delete(np.arange(len(order)), test_rows)
+
+    @timed('scenario.get_fold')
+    def get_fold(self, test_set: bool, repetition: int, fold: int) -> typing.Tuple:
+        """
+        Returns the subset of the scenario files (in order of result_types),
+        i.e., instances given a repetition, fold and whether to return the
+        test set (train set otherwise). The rows of every fold are located
+        once per repetition; the returned frames hold a copy of those rows.
+        """
+        result = []
+        for file_type in self.result_types:
+            scenario_frame = self.frames[file_type]
+            if scenario_frame is None:
+                result.append(None)
+                continue
+            result.append(scenario_frame.iloc[self._get_rows(file_type, test_set, repetition, fold)])
+        return tuple(result)
+
+
+@functools.lru_cache(maxsize=4)
+def _cached_cv_scenario(scenario_folder: str, use_cache: bool, signature: typing.Tuple) -> CVScenario:
+    return CVScenario(scenario_folder, use_cache)
+
+
+def _folder_signature(scenario_folder: str) -> typing.Tuple:
+    # modification times of the files a CVScenario reads
+    signature = []
+    for file_type in ('cv',) + CVScenario.result_types:
+        filepath = os.path.join(scenario_folder, '%s.arff' % file_type)
+        signature.append(os.stat(filepath).st_mtime_ns if os.path.isfile(filepath) else None)
+    return tuple(signature)
 
 
-def scenario_to_fold(scenario_folder, test_set, repetition, fold):
+@timed('scenario.scenario_to_fold')
+def scenario_to_fold(scenario_folder, test_set, repetition, fold, use_cache=True):
     """
     Returns the subset of a scenario, i.e., instances given a repetition, fold
-    and whether to return the test set (train set otherwise).
+    and whether to return the test set (train set otherwise). The CVScenario
+    of the last few scenario folders is kept in memory (until one of its
+    files changes), so extracting multiple folds parses the files once.
     """
-    with open(os.path.join(scenario_folder, 'cv.arff')) as fp:
-        cv_arff = arff.load(fp)
-
-    cv_frame = openmlcontrib.meta.arff_to_dataframe(cv_arff, None)
-    cv_frame = cv_frame.loc[(cv_frame['repetition'] == repetition) & (cv_frame['fold'] == fold)]
-    instance_ids = cv_frame['instance_id'].values
-
-    result_types = ('algorithm_runs', 'feature_costs', 'feature_runstatus', 'feature_values')
-    result = []
-
-    for file_type in result_types:
-        filepath = os.path.join(scenario_folder, '%s.arff' % file_type)
-        if not os.path.isfile(filepath):
-            logging.warning('Scenario folder %s does not have file type: %s' % (scenario_folder, file_type))
-            result.append(None)
-            continue
-        with open(filepath) as fp:
-            scenario_arff = arff.load(fp)
-
-        scenario_frame = openmlcontrib.meta.arff_to_dataframe(scenario_arff, None)
-        if test_set:
-            scenario_frame = scenario_frame.loc[scenario_frame['instance_id'].isin(instance_ids)]
-        else:
-            scenario_frame = scenario_frame.loc[~scenario_frame['instance_id'].isin(instance_ids)]
-        result.append(scenario_frame)
-    return tuple(result)
+    scenario_folder = os.path.abspath(scenario_folder)
+    scenario = _cached_cv_scenario(scenario_folder, use_cache, _folder_signature(scenario_folder))
+    return scenario.get_fold(test_set, repetition, fold)
@@ -0,0 +1,134 @@
+import os
+import pandas as pd
+import typing
+import yaml
+
+from ..instrumentation import timed
+from .cache import load_arff_frame
+from .general import CVScenario, _deduce_objective_function, _join_evaluations
+
+
+# penalty factor for runs that did not finish (as in ASlibScenario)
+PAR_FACTOR = 10
+
+
+class ScenarioData(object):
+
+    def __init__(self, scenario_folder: str, description: typing.Dict, frame: pd.DataFrame,
+                 performance_data: pd.DataFrame, runstatus_data: pd.DataFrame, feature_data: pd.DataFrame,
+                 feature_runstatus_data: pd.DataFrame, feature_cost_data: typing.Optional[pd.DataFrame]):
+        """
+        A scenario folder parsed once (see load_scenario). Holds both the
+        joined (long) frame as used by SklearnModelWrapper and the instance x
+        algorithm (or feature step) matrices with the same names and semantics
+        as the attributes of ASlibScenario, so that it can be passed to the
+        Validator / ScoringContext instead.
+        """
+        self.scenario_folder = scenario_folder
+        self.description = description
+        self.frame = frame
+        self.performance_data = performance_data
+        self.runstatus_data = runstatus_data
+        self.feature_data = feature_data
+        self.feature_runstatus_data = feature_runstatus_data
+        self.feature_cost_data = feature_cost_data
+
+        self.scenario = description.get('scenario_id')
+        self.performance_measure = description['performance_measures']
+        self.performance_type = description['performance_type']
+        self.maximize = description['maximize']
+        self.algorithm_cutoff_time = description.get('algorithm_cutoff_time')
+        self.feature_group_dict = description.get('feature_steps') or dict()
+        # as in ASlibScenario, every step of the description is a known step
+        self.feature_steps = list(self.feature_group_dict.keys())
+        self.feature_steps_default = description.get('default_steps')
+        self.instances = list(performance_data.index)
+        self.algorithms = list(performance_data.columns)
+
+
+def _instance_matrix(frame: pd.DataFrame, numeric: bool) -> pd.DataFrame:
+    # one row per instance: numeric values are averaged over repetitions
+    frame = frame.drop('repetition', axis=1)
+    grouped = frame.groupby('instance_id', sort=False)
+    return grouped.mean() if numeric else grouped.first()
+
+
+def _read_description(scenario_folder: str) -> typing.Dict:
+    with open(os.path.join(scenario_folder, 'description.txt'), 'r') as fp:
+        return yaml.safe_load(fp)
+
+
+def scenario_from_frames(scenario_folder: str, description: typing.Dict, features: pd.DataFrame,
+                         feature_status: pd.DataFrame, evaluations: pd.DataFrame,
+                         feature_costs: typing.Optional[pd.DataFrame]) -> ScenarioData:
+    """
+    Derives the training frame (as obtain_dataframe_scenario) and the matrices
+    used for validation (as ASlibScenario.read_scenario: performance is
+    multiplied by -1 for maximization, runs that are not ok get PAR10 for
+    runtime) from the (parsed) files of a scenario.
+    """
+    # training frame
+    objective_function = _deduce_objective_function(evaluations.columns)
+    joined_features = features.set_index(['instance_id', 'repetition']).join(
+        feature_status.set_index(['instance_id', 'repetition']))
+    frame = _join_evaluations(evaluations[['instance_id', 'algorithm', 'repetition', objective_function]],
+                              joined_features, objective_function)
+
+    # validation matrices
+    instances = pd.unique(evaluations['instance_id'])
+    algorithms = pd.unique(evaluations['algorithm'])
+    performance_data = evaluations.pivot_table(index='instance_id', columns='algorithm', values=objective_function,
+                                               aggfunc='mean', dropna=False)
+    performance_data = performance_data.reindex(index=instances, columns=algorithms)
+    runstatus_data = evaluations.pivot_table(index='instance_id', columns='algorithm', values='runstatus',
+                                             aggfunc='first', dropna=False)
+    runstatus_data = runstatus_data.reindex(index=instances, columns=algorithms)
+    if description['performance_type'][0] == 'runtime':
+        performance_data = performance_data.where(runstatus_data == 'ok',
+                                                  description['algorithm_cutoff_time'] * PAR_FACTOR)
+    if description['maximize'][0]:
+        performance_data = performance_data * -1
+
+    feature_data = _instance_matrix(features, True).reindex(instances)
+    feature_runstatus_data = _instance_matrix(feature_status, False).reindex(instances)
+    feature_cost_data = None
+    if feature_costs is not None:
+        feature_cost_data = _instance_matrix(feature_costs, True).reindex(instances)
+
+    return ScenarioData(scenario_folder, description, frame, performance_data, runstatus_data, feature_data,
+                        feature_runstatus_data, feature_cost_data)
+
+
+@timed('scenario.load_scenario')
+def load_scenario(scenario_folder: str, use_cache: bool = True) -> ScenarioData:
+    """
+    Parses every file of a scenario folder once, and derives from them both
+    the training frame and the validation matrices (see scenario_from_frames)
+    """
+    features, _ = load_arff_frame(os.path.join(scenario_folder, 'feature_values.arff'), use_cache)
+    feature_status, _ = load_arff_frame(os.path.join(scenario_folder, 'feature_runstatus.arff'), use_cache)
+    evaluations, _ = load_arff_frame(os.path.join(scenario_folder, 'algorithm_runs.arff'), use_cache)
+    feature_costs = None
+    if os.path.isfile(os.path.join(scenario_folder, 'feature_costs.arff')):
+        feature_costs, _ = load_arff_frame(os.path.join(scenario_folder, 'feature_costs.arff'), use_cache)
+    return scenario_from_frames(scenario_folder, _read_description(scenario_folder), features, feature_status,
+                                evaluations, feature_costs)
+
+
+@timed('scenario.fold_scenarios')
+def fold_scenarios(scenario: CVScenario, repetition: int, fold: int) \
+        -> typing.Tuple[ScenarioData, ScenarioData]:
+    """
+    Returns the test and train scenario of a repetition / fold, built from
+    the files the CVScenario holds in memory. They are the same as loading
+    the folders written by save_scenario_in_oasc_format, without writing and
+    parsing them.
+    """
+    description = _read_description(scenario.scenario_folder)
+    result = []
+    for test_set in [True, False]:
+        frames = dict(zip(scenario.result_types, scenario.get_fold(test_set, repetition, fold)))
+        result.append(scenario_from_frames(scenario.scenario_folder, description, frames['feature_values'],
+                                           frames['feature_runstatus'], frames['algorithm_runs'],
+                                           frames['feature_costs']))
+    return result[0], result[1]
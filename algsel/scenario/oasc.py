@@ -1,14 +1,24 @@
 import algsel
-import arff
-import openmlcontrib
+import hashlib
+import json
+import logging
 import os
 import pandas as pd
 import typing
 import shutil
+import tempfile
 import yaml
 
+from .general import CVScenario
 
-def get_oasc_train_and_test_frame(oasc_scenario_dir: str, scenario_name: str) \
+
+CONTENT_HASH_FILE = '.content_hash'
+MANIFEST_FILE = '.manifest.json'
+# cached fold exports that were checked against their manifest by this process
+_verified_exports = set()
+
+
+def get_oasc_train_and_test_frame(oasc_scenario_dir: str, scenario_name: str, use_cache: bool = True) \
         -> typing.Tuple[pd.DataFrame, pd.DataFrame, typing.Dict]:
     meta_arff_train_location = os.path.join(oasc_scenario_dir, 'train', scenario_name, 'feature_values.arff')
     runs_arff_train_location = os.path.join(oasc_scenario_dir, 'train', scenario_name, 'algorithm_runs.arff')
@@ -21,36 +31,245 @@ def get_oasc_train_and_test_frame(oasc_scenario_dir: str, scenario_name: str) \
     description_location = os.path.join(oasc_scenario_dir, 'test', scenario_name, 'description.txt')
 
     with open(description_location, 'r') as fp:
-        description = yaml.load(fp)
+        description = yaml.safe_load(fp)
 
-    train_frame = algsel.scenario.obtain_dataframe_scenario(meta_arff_train_location, runs_arff_train_location, status_arff_train_location)
-    test_frame = algsel.scenario.obtain_dataframe_scenario(meta_arff_test_location, runs_arff_test_location, status_arff_test_location)
+    train_frame = algsel.scenario.obtain_dataframe_scenario(meta_arff_train_location, runs_arff_train_location,
+                                                            status_arff_train_location, use_cache)
+    test_frame = algsel.scenario.obtain_dataframe_scenario(meta_arff_test_location, runs_arff_test_location,
+                                                           status_arff_test_location, use_cache)
     return train_frame, test_frame, description
 
 
+def fold_content_hash(frames: typing.Iterable[typing.Optional[pd.DataFrame]],
+                      attributes: typing.Iterable[typing.Optional[typing.List]],
+                      description_file: str) -> str:
+    """
+    Returns a hash over the content of the frames of a fold, their arff
+    attributes and the scenario description.
+    """
+    hasher = hashlib.sha1()
+    for frame, frame_attributes in zip(frames, attributes):
+        if frame is None:
+            hasher.update(b'None')
+            continue
+        hasher.update(json.dumps(frame_attributes).encode('utf-8'))
+        hasher.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    with open(description_file, 'rb') as fp:
+        hasher.update(fp.read())
+    return hasher.hexdigest()
+
+
+def _memoized_hash(scenario: CVScenario, key: typing.Tuple, description_file: str,
+                   compute: typing.Callable[[], str]) -> str:
+    # the frames of a CVScenario do not change, the description might
+    key = key + (os.stat(description_file).st_mtime_ns,)
+    if key not in scenario._content_hashes:
+        scenario._content_hashes[key] = compute()
+    return scenario._content_hashes[key]
+
+
+def _place_file(source: str, destination: str, mode: str) -> None:
+    if os.path.lexists(destination):
+        os.remove(destination)
+    if mode == 'hardlink':
+        try:
+            os.link(source, destination)
+            return
+        except OSError:
+            pass  # e.g., across file systems
+    elif mode == 'symlink':
+        os.symlink(os.path.abspath(source), destination)
+        return
+    shutil.copyfile(source, destination)
+
+
 def save_scenario_in_oasc_format(scenario_folder: str, scenario_name: str,
-                                 to_folder: str, repetition: int, fold: int) -> None:
+                                 to_folder: str, repetition: int, fold: int, use_cache: bool = True,
+                                 scenario: typing.Optional[CVScenario] = None,
+                                 description_mode: str = 'copy', skip_unchanged: bool = False,
+                                 export_cache_dir: typing.Optional[str] = None) -> None:
     """
     Extracts a single repetition / fold from the scenario and saves it in oasc
-    format
+    format. Pass a CVScenario of the scenario folder to avoid loading the
+    scenario again for every fold. The description is copied, hardlinked or
+    symlinked (description_mode). With skip_unchanged, a train / test folder
+    is not written again if it holds a complete export with the same content
+    hash. Files that are not part of the export (e.g., the feature costs of
+    an earlier version of the scenario) are removed.
+    With export_cache_dir, the fold is exported once to that cache (see
+    cached_fold_export) and the train / test folders are symlinks to the
+    read-only export.
     """
+    if description_mode not in ('copy', 'hardlink', 'symlink'):
+        raise ValueError('Unknown description mode: %s' % description_mode)
+    if scenario is None:
+        scenario = CVScenario(scenario_folder, use_cache)
+    if export_cache_dir is not None:
+        export_folder = cached_fold_export(scenario_folder, scenario_name, export_cache_dir, repetition, fold,
+                                           use_cache, scenario)
+        for subset in ['test', 'train']:
+            out_folder = os.path.join(to_folder, subset, scenario_name)
+            os.makedirs(os.path.dirname(out_folder), exist_ok=True)
+            if os.path.islink(out_folder):
+                os.remove(out_folder)
+            elif os.path.isdir(out_folder):
+                shutil.rmtree(out_folder)
+            os.symlink(os.path.join(export_folder, subset, scenario_name), out_folder)
+        return
+    description_file = os.path.join(scenario_folder, 'description.txt')
+    attributes = [scenario.attributes[file_type] for file_type in scenario.result_types]
+    # the files of an export, all others are removed
+    export_files = ['%s.arff' % file_type for file_type in scenario.result_types
+                    if scenario.frames[file_type] is not None] + ['description.txt']
+
     for test_bool in [True, False]:
-        res = algsel.scenario.scenario_to_fold(scenario_folder, test_bool, repetition, fold)
-        algorithm_runs, feature_costs, feature_runstatus, feature_values = res
         out_folder = os.path.join(to_folder, 'test' if test_bool else 'train', scenario_name)
+        hash_file = os.path.join(out_folder, CONTENT_HASH_FILE)
         os.makedirs(out_folder, exist_ok=True)
+        previous = _read_hash_file(hash_file)
 
-        with open(os.path.join(out_folder, 'algorithm_runs.arff'), 'w') as fp:
-            arff.dump(openmlcontrib.meta.dataframe_to_arff(algorithm_runs, 'algorithm_runs', None), fp)
-        if feature_costs is not None:
-            with open(os.path.join(out_folder, 'feature_costs.arff'), 'w') as fp:
-                arff.dump(openmlcontrib.meta.dataframe_to_arff(feature_costs, 'feature_costs', None), fp)
-        with open(os.path.join(out_folder, 'feature_runstatus.arff'), 'w') as fp:
-            arff.dump(openmlcontrib.meta.dataframe_to_arff(feature_runstatus, 'feature_runstatus', None), fp)
-        with open(os.path.join(out_folder, 'feature_values.arff'), 'w') as fp:
-            arff.dump(openmlcontrib.meta.dataframe_to_arff(feature_values, 'feature_values', None), fp)
+        content_hash = None
+        if skip_unchanged:
+            content_hash = _memoized_hash(
+                scenario, ('test' if test_bool else 'train', repetition, fold), description_file,
+                lambda: fold_content_hash(scenario.get_fold(test_bool, repetition, fold), attributes,
+                                          description_file))
+            if previous is not None and previous['content_hash'] == content_hash and \
+                    all(os.path.isfile(os.path.join(out_folder, name)) for name in previous['files']):
+                logging.info('Fold export %s unchanged, skipping' % out_folder)
+                continue
+        if os.path.isfile(hash_file):
+            os.remove(hash_file)
+
+        stale_files = {'%s.arff' % file_type for file_type in scenario.result_types}
+        if previous is not None:
+            stale_files.update(previous['files'])
+        for name in stale_files.difference(export_files):
+            if os.path.lexists(os.path.join(out_folder, name)):
+                os.remove(os.path.join(out_folder, name))
+
+        res = scenario.get_fold(test_bool, repetition, fold)
+        for file_type, frame, frame_attributes in zip(scenario.result_types, res, attributes):
+            if frame is None:
+                continue
+            algsel.scenario.write_arff(frame, file_type, os.path.join(out_folder, '%s.arff' % file_type),
+                                       frame_attributes)
         # also copy description
-        shutil.copyfile(
-            os.path.join(scenario_folder, 'description.txt'),
-            os.path.join(out_folder, 'description.txt')
-        )
+        _place_file(description_file, os.path.join(out_folder, 'description.txt'), description_mode)
+
+        if content_hash is not None:
+            with open(hash_file, 'w') as fp:
+                json.dump({'content_hash': content_hash, 'files': export_files}, fp)
+
+
+def _read_hash_file(hash_file: str) -> typing.Optional[typing.Dict]:
+    # content hash and file list of an export (None if missing or unreadable)
+    if not os.path.isfile(hash_file):
+        return None
+    try:
+        with open(hash_file, 'r') as fp:
+            content = json.load(fp)
+    except ValueError:
+        return None
+    if not isinstance(content, dict) or not {'content_hash', 'files'}.issubset(content):
+        return None
+    return content
+
+
+def _file_hash(filepath: str) -> str:
+    hasher = hashlib.sha1()
+    with open(filepath, 'rb') as fp:
+        for block in iter(lambda: fp.read(1 << 20), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def _verify_export(export_folder: str) -> bool:
+    manifest_file = os.path.join(export_folder, MANIFEST_FILE)
+    if not os.path.isfile(manifest_file):
+        return False
+    with open(manifest_file, 'r') as fp:
+        manifest = json.load(fp)
+    for relative_path, file_hash in manifest.items():
+        filepath = os.path.join(export_folder, relative_path)
+        if not os.path.isfile(filepath) or _file_hash(filepath) != file_hash:
+            return False
+    return True
+
+
+def _remove_export(export_folder: str) -> None:
+    # exports are read-only, make them writable before removing them
+    for root, dirs, _ in os.walk(export_folder):
+        for name in dirs:
+            os.chmod(os.path.join(root, name), 0o755)
+    os.chmod(export_folder, 0o755)
+    shutil.rmtree(export_folder)
+
+
+def cached_fold_export(scenario_folder: str, scenario_name: str, export_cache_dir: str, repetition: int, fold: int,
+                       use_cache: bool = True, scenario: typing.Optional[CVScenario] = None,
+                       verify: bool = False) -> str:
+    """
+    Exports a single repetition / fold in oasc format to a content addressed
+    cache and returns the export folder (holding test/<scenario_name> and
+    train/<scenario_name>). The folder is named after the content hash of the
+    fold, so every distinct fold is written only once, no matter how many
+    runs (seeds, systems) use it. The content hash is computed once per fold
+    and CVScenario. Exports are read-only and carry a manifest of file
+    hashes, which is checked the first time a process reuses an export, and
+    on every reuse if verify is set (a corrupt export is written again).
+    """
+    if scenario is None:
+        scenario = CVScenario(scenario_folder, use_cache)
+    description_file = os.path.join(scenario_folder, 'description.txt')
+
+    def compute_hash():
+        attributes = [scenario.attributes[file_type] for file_type in scenario.result_types]
+        frames = scenario.get_fold(True, repetition, fold) + scenario.get_fold(False, repetition, fold)
+        return hashlib.sha1(('%s:%s' % (scenario_name, fold_content_hash(
+            frames, attributes + attributes, description_file))).encode('utf-8')).hexdigest()
+
+    content_hash = _memoized_hash(scenario, ('export', scenario_name, repetition, fold), description_file,
+                                  compute_hash)
+    export_folder = os.path.join(export_cache_dir, content_hash)
+    if os.path.isdir(export_folder):
+        if (export_folder in _verified_exports and not verify) or _verify_export(export_folder):
+            _verified_exports.add(export_folder)
+            logging.info('Using cached fold export %s' % export_folder)
+            return export_folder
+        logging.warning('Cached fold export %s is corrupt, exporting again' % export_folder)
+        _remove_export(export_folder)
+
+    # export next to the final location and move it in place atomically, so
+    # concurrent exports of the same fold do not see partial results
+    os.makedirs(export_cache_dir, exist_ok=True)
+    temp_folder = tempfile.mkdtemp(prefix='.%s.' % content_hash, dir=export_cache_dir)
+    try:
+        save_scenario_in_oasc_format(scenario_folder, scenario_name, temp_folder, repetition, fold,
+                                     scenario=scenario)
+        manifest = dict()
+        for root, _, files in os.walk(temp_folder):
+            for name in files:
+                filepath = os.path.join(root, name)
+                manifest[os.path.relpath(filepath, temp_folder)] = _file_hash(filepath)
+                os.chmod(filepath, 0o444)
+        with open(os.path.join(temp_folder, MANIFEST_FILE), 'w') as fp:
+            json.dump(manifest, fp, indent=2, sort_keys=True)
+        os.chmod(os.path.join(temp_folder, MANIFEST_FILE), 0o444)
+        for root, dirs, _ in os.walk(temp_folder):
+            for name in dirs:
+                os.chmod(os.path.join(root, name), 0o555)
+        try:
+            os.rename(temp_folder, export_folder)
+            os.chmod(export_folder, 0o555)
+            _verified_exports.add(export_folder)
+        except OSError:
+            if not os.path.isdir(export_folder):
+                raise
+            # exported by another process in the meantime
+            _remove_export(temp_folder)
+    except BaseException:
+        if os.path.isdir(temp_folder):
+            _remove_export(temp_folder)
+        raise
+    return export_folder
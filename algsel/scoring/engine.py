@@ -0,0 +1,189 @@
+import logging
+import numpy as np
+import pandas as pd
+import typing
+
+from aslib_scenario.aslib_scenario import ASlibScenario
+
+
+# schedule entries that are not part of the scenario are encoded as SKIP,
+# padding as PAD
+SKIP = -2
+PAD = -1
+
+
+def sequential_sum(values: np.ndarray) -> float:
+    """
+    Sums values in order (as a loop with += would), rather than pairwise
+    """
+    if len(values) == 0:
+        return 0.0
+    return float(np.cumsum(values, dtype=np.float64)[-1])
+
+
+def read_only_values(frame: pd.DataFrame) -> np.ndarray:
+    """
+    Returns the values of a (float) frame as read-only array, without
+    copying them if the frame holds a single float block
+    """
+    values = frame.to_numpy(dtype=np.float64).view()
+    values.setflags(write=False)
+    return values
+
+
+class RuntimeArrays(object):
+
+    def __init__(self, test_scenario: ASlibScenario):
+        """
+        NumPy representation of a runtime scenario, used for scoring
+        schedules. Schedule entries (algorithms and feature steps) are
+        represented as column index into time and solved: first the
+        algorithms, then the feature steps.
+
+            time: time an entry takes on an instance (feature steps only
+                  take time if the scenario has feature costs)
+            solved: whether the entry solves the instance (algorithm run
+                    with status ok, or feature step with status presolved)
+        """
+        self.logger = logging.getLogger("RuntimeArrays")
+        self.cutoff = test_scenario.algorithm_cutoff_time
+        self.instances = test_scenario.performance_data.index
+        self.algorithms = list(test_scenario.performance_data.columns)
+        self.feature_steps = list(test_scenario.feature_steps)
+        self.feature_group_dict = test_scenario.feature_group_dict
+        self.entry_index = {entry: idx for idx, entry in enumerate(self.algorithms)}
+        for idx, step in enumerate(self.feature_steps):
+            self.entry_index.setdefault(step, len(self.algorithms) + idx)
+        self.is_algorithm = np.arange(len(self.algorithms) + len(self.feature_steps)) < len(self.algorithms)
+
+        shape = (len(self.instances), len(self.algorithms) + len(self.feature_steps))
+        self.time = np.zeros(shape, dtype=np.float64)
+        self.solved = np.zeros(shape, dtype=bool)
+
+        self.time[:, :len(self.algorithms)] = test_scenario.performance_data.to_numpy(dtype=np.float64)
+        runstatus = test_scenario.runstatus_data.reindex(index=self.instances, columns=self.algorithms)
+        self.solved[:, :len(self.algorithms)] = runstatus.to_numpy() == "ok"
+        if self.feature_steps:
+            if test_scenario.feature_cost_data is not None:
+                feature_cost = test_scenario.feature_cost_data.reindex(index=self.instances,
+                                                                       columns=self.feature_steps)
+                self.time[:, len(self.algorithms):] = feature_cost.to_numpy(dtype=np.float64)
+            feature_runstatus = test_scenario.feature_runstatus_data.reindex(index=self.instances,
+                                                                             columns=self.feature_steps)
+            self.solved[:, len(self.algorithms):] = feature_runstatus.to_numpy() == "presolved"
+
+    def encode_schedules(self, schedules: dict) -> typing.Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Encodes schedules {instance name -> [algo | feature step | [algo, budget]]}
+        as arrays: the row of each instance, and padded matrices with the entry
+        index and budget per schedule step.
+        """
+        rows = self.instances.get_indexer(list(schedules.keys()))
+        if (rows < 0).any():
+            raise KeyError('Schedules for unknown instances: %s' % [inst for inst, row in zip(schedules, rows)
+                                                                   if row < 0])
+        max_length = max([len(schedule) for schedule in schedules.values()], default=0)
+        entries = np.full((len(schedules), max_length), PAD, dtype=np.int64)
+        budgets = np.full((len(schedules), max_length), np.inf, dtype=np.float64)
+
+        for idx, (inst, schedule) in enumerate(schedules.items()):
+            feature_steps_used = []
+            for step, entry in enumerate(schedule):
+                if isinstance(entry, str):
+                    if entry in self.entry_index:
+                        entries[idx, step] = self.entry_index[entry]
+                        if not self.is_algorithm[self.entry_index[entry]]:
+                            feature_steps_used.append(entry)
+                            if self.feature_group_dict[entry].get("requires") is not None:
+                                missing_f_groups = list(
+                                    set(self.feature_group_dict[entry]["requires"]).difference(feature_steps_used))
+                                if missing_f_groups:
+                                    self.logger.error("Required feature steps (%s) are missing for computing %s." % (
+                                        missing_f_groups, entry))
+                    else:
+                        self.logger.error("Schedule entry %s for %s not found in data" % (entry, inst))
+                        entries[idx, step] = SKIP
+                elif isinstance(entry, list):  # algorithm
+                    algo, budget = entry
+                    entries[idx, step] = self.entry_index[algo]
+                    budgets[idx, step] = budget
+                else:
+                    entries[idx, step] = SKIP
+        return rows, entries, budgets
+
+    def score(self, rows: np.ndarray, entries: np.ndarray, budgets: np.ndarray) \
+            -> typing.Tuple[np.ndarray, np.ndarray]:
+        """
+        Scores encoded schedules. Every instance is either solved (the first
+        step that solves it within the cutoff) or a timeout (cutoff reached,
+        or schedule ended without solving it). Returns whether each instance
+        is solved and its PAR1 contribution.
+        """
+        if entries.shape[1] == 0:
+            return np.zeros(len(rows), dtype=bool), np.full(len(rows), self.cutoff, dtype=np.float64)
+        valid = entries >= 0
+        entry_idx = np.where(valid, entries, 0)
+        row_idx = rows[:, np.newaxis]
+
+        time = self.time[row_idx, entry_idx]
+        is_algorithm = self.is_algorithm[entry_idx]
+        step_time = np.where(is_algorithm, np.minimum(time, budgets), time)
+        step_time[~valid] = 0.0
+        step_solved = valid & self.solved[row_idx, entry_idx] & (~is_algorithm | (time <= budgets))
+
+        used_time = np.cumsum(step_time, axis=1)
+        solved_event = step_solved & (used_time <= self.cutoff)
+        timeout_event = valid & (used_time >= self.cutoff)
+        event = solved_event | timeout_event
+
+        first_event = np.argmax(event, axis=1)
+        has_event = event[np.arange(len(rows)), first_event]
+        solved = has_event & solved_event[np.arange(len(rows)), first_event]
+        par1 = np.where(solved, used_time[np.arange(len(rows)), first_event], self.cutoff)
+
+        if (~has_event).any():
+            self.logger.warning("%d schedules ended without using all time, counting as timeout" %
+                                (~has_event).sum())
+        return solved, par1
+
+
+class QualityArrays(object):
+
+    def __init__(self, test_scenario: ASlibScenario):
+        """
+        NumPy representation of a solution quality scenario, used for scoring
+        schedules. Only the first algorithm of a schedule is used.
+        """
+        self.logger = logging.getLogger("QualityArrays")
+        self.instances = test_scenario.performance_data.index
+        self.algorithms = list(test_scenario.performance_data.columns)
+        self.algorithm_index = {algorithm: idx for idx, algorithm in enumerate(self.algorithms)}
+        self.performance = read_only_values(test_scenario.performance_data)
+
+    def encode_schedules(self, schedules: dict) -> typing.Tuple[np.ndarray, np.ndarray]:
+        """
+        Encodes schedules {instance name -> [algo | feature step | [algo, budget]]}
+        as arrays: the row of each instance and the index of the selected
+        (first) algorithm.
+        """
+        rows = self.instances.get_indexer(list(schedules.keys()))
+        if (rows < 0).any():
+            raise KeyError('Schedules for unknown instances: %s' % [inst for inst, row in zip(schedules, rows)
+                                                                   if row < 0])
+        selected = np.empty(len(schedules), dtype=np.int64)
+        for idx, (inst, schedule) in enumerate(schedules.items()):
+            if len(schedule) == 0:
+                raise ValueError('Found empty schedule for instance %s' % inst)
+            for entry in schedule:
+                if isinstance(entry, list):
+                    entry = entry[0]  # ignore cutoff
+                elif not isinstance(entry, str):
+                    raise ValueError('schedule entries should be of type str or list')
+                if entry in self.algorithm_index:
+                    selected[idx] = self.algorithm_index[entry]
+                    break
+                else:
+                    self.logger.debug("Skip %s" % (entry))
+            else:
+                raise ValueError('No algorithm in schedule for instance %s' % inst)
+        return rows, selected
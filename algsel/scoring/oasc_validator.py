@@ -1,10 +1,15 @@
+import concurrent.futures
 import sys
 import logging
-
 import numpy as np
+import pandas as pd
+import typing
 
 from aslib_scenario.aslib_scenario import ASlibScenario
 
+from ..instrumentation import timed
+from .engine import QualityArrays, RuntimeArrays, read_only_values, sequential_sum
+
 __author__ = "Marius Lindauer, Jan N. van Rijn"
 __license__ = "BSD"
 
@@ -158,12 +163,98 @@ class Stats(object):
         self.logger.info("Gap remaining: %.4f" % self.get_gap_remaining(remove_unsolvable))
 
 
+class ScoringContext(object):
+
+    def __init__(self, test_scenario: ASlibScenario, train_scenario: ASlibScenario):
+        """
+        Precomputes everything that is needed to score schedules on a test
+        scenario: the performance arrays, the oracle, the single best solver
+        (on the train scenario) and the unsolvable instances. The scenarios
+        (ASlibScenario or algsel.scenario.ScenarioData) are not modified.
+        """
+        self.runtime = test_scenario.performance_type[0] == "runtime"
+        self.maximize = test_scenario.maximize[0]
+        self.instances = set(test_scenario.instances)
+
+        if self.runtime:
+            self.runtime_cutoff = test_scenario.algorithm_cutoff_time
+            self.arrays = RuntimeArrays(test_scenario)
+            ok_status = test_scenario.runstatus_data == "ok"
+            self.unsolvable = (ok_status.sum(axis=1) == 0).sum()
+            self.oracle_par10 = test_scenario.performance_data.min(axis=1).sum()
+            self.sbs = train_scenario.performance_data.sum(axis=0).idxmin()
+            self.sbs_par10 = test_scenario.performance_data.sum(axis=0)[self.sbs]
+        else:
+            # ASlibScenario multiplies the performance by -1 for maximization,
+            # so the arrays are always minimized and sign restores the values
+            self.runtime_cutoff = None
+            self.sign = -1 if self.maximize else 1
+            self.arrays = QualityArrays(test_scenario)
+            train_performance = read_only_values(train_scenario.performance_data)
+            self.unsolvable = 0
+            self.oracle_par10 = self.sign * np.nansum(np.nanmin(self.arrays.performance, axis=1))
+            self.sbs = train_scenario.performance_data.columns[np.argmin(np.nansum(train_performance, axis=0))]
+            sbs_idx = self.arrays.algorithm_index[self.sbs]
+            self.sbs_par10 = self.sign * np.nansum(self.arrays.performance[:, sbs_idx])
+            self.sbs_performance = self.arrays.performance[:, sbs_idx]
+
+    def missing_instances(self, schedules: dict) -> set:
+        return self.instances.difference(schedules.keys())
+
+    def score(self, schedules: dict) -> Stats:
+        """
+            scores schedules, without logging them
+
+            Arguments
+            ---------
+            schedules: dict {instance name -> tuples [algo, bugdet]}
+                algorithm schedules per instance
+
+            Returns
+            -------
+            stats: Stats
+                statistics of the schedules
+        """
+        stat = Stats(runtime_cutoff=self.runtime_cutoff, maximize=self.maximize)
+        stat.unsolvable += self.unsolvable
+        stat.oracle_par10 = self.oracle_par10
+        stat.sbs_par10 = self.sbs_par10
+
+        if self.runtime:
+            solved, par1 = self.arrays.score(*self.arrays.encode_schedules(schedules))
+            stat.solved += int(solved.sum())
+            stat.timeouts += int((~solved).sum())
+            stat.par1 += sequential_sum(par1)
+            stat.par10 = stat.par1 + 9 * self.runtime_cutoff * stat.timeouts
+        else:
+            rows, selected = self.arrays.encode_schedules(schedules)
+            performance = self.arrays.performance[rows, selected]
+            stat.par1 += sequential_sum(self.sign * performance)
+            stat.solved += len(rows)
+            # in the (minimized) arrays, worse always means larger
+            stat.worse_than_sbs += int((performance > self.sbs_performance[rows]).sum())
+        return stat
+
+
+_process_context = None
+
+
+def _init_process_context(context: ScoringContext) -> None:
+    global _process_context
+    _process_context = context
+
+
+def _score_in_process(schedules: dict) -> Stats:
+    return _process_context.score(schedules)
+
+
 class Validator(object):
 
     def __init__(self):
         """ Constructor """
         self.logger = logging.getLogger("Validation")
 
+    @timed('scoring.validate_runtime')
     def validate_runtime(self, schedules: dict, test_scenario: ASlibScenario,
                          train_scenario: ASlibScenario):
         """
@@ -181,89 +272,83 @@ class Validator(object):
         if test_scenario.performance_type[0] != "runtime":
             raise ValueError("Cannot validate non-runtime scenario with runtime validation method")
 
-        stat = Stats(runtime_cutoff=test_scenario.algorithm_cutoff_time,
-                     maximize=test_scenario.maximize[0])
-
-        feature_times = False
-        if test_scenario.feature_cost_data is not None and test_scenario.performance_type[0] == "runtime":
-            feature_times = True
-
-        ok_status = test_scenario.runstatus_data == "ok"
-        unsolvable = ok_status.sum(axis=1) == 0
-        stat.unsolvable += unsolvable.sum()
+        context = ScoringContext(test_scenario, train_scenario)
 
         # ensure that we got predictions for all test instances
-        if set(test_scenario.instances).difference(schedules.keys()):
-            self.logger.error(
-                "Missing predictions for %s" % (set(test_scenario.instances).difference(schedules.keys())))
+        if context.missing_instances(schedules):
+            self.logger.error("Missing predictions for %s" % context.missing_instances(schedules))
             sys.exit(1)
 
-        stat.oracle_par10 = test_scenario.performance_data.min(axis=1).sum()
-        sbs = train_scenario.performance_data.sum(axis=0).argmin()
-        stat.sbs_par10 = test_scenario.performance_data.sum(axis=0)[sbs]
-
-        for inst, schedule in schedules.items():
-            self.logger.debug("Validate: %s on %s" % (schedule, inst))
-
-            used_time = 0
-            feature_steps_used = []
-            for entry in schedule:
-                if isinstance(entry, str):
-                    if entry in test_scenario.algorithms:
-                        algo = entry
-                        budget = np.inf
-                        time = test_scenario.performance_data[algo][inst]
-                        self.logger.debug("Alloted time %f of %s vs true time %f" % (budget, algo, time))
-                        used_time += min(time, budget)
-                        solved = (time <= budget) and test_scenario.runstatus_data[algo][inst] == "ok"
-                    elif entry in test_scenario.feature_steps:
-                        feature_steps_used.append(entry)
-                        if test_scenario.feature_group_dict[entry].get("requires") is not None:
-                            missing_f_groups = list(
-                                set(test_scenario.feature_group_dict[entry]["requires"]).difference(feature_steps_used))
-                            if missing_f_groups:
-                                self.logger.error("Required feature steps (%s) are missing for computing %s." % (
-                                missing_f_groups, entry))
-                        if feature_times:
-                            ftime = test_scenario.feature_cost_data[entry][inst]
-                            self.logger.debug("Used Feature time: %f" % (ftime))
-                            used_time += ftime
-                        solved = (test_scenario.feature_runstatus_data[entry][inst] == "presolved")
-                    else:
-                        self.logger.error("Schedule entry %s for %s not found in data" % (entry, inst))
-                elif isinstance(entry, list):  # algorithm
-                    algo, budget = entry
-                    time = test_scenario.performance_data[algo][inst]
-                    self.logger.debug("Alloted time %f of %s vs true time %f" % (budget, algo, time))
-                    used_time += min(time, budget)
-                    solved = (time <= budget) and test_scenario.runstatus_data[algo][inst] == "ok"
-                self.logger.debug("Used time (so far): %f" % (used_time))
-
-                if solved and used_time <= test_scenario.algorithm_cutoff_time:
-                    stat.solved += 1
-                    stat.par1 += used_time
-                    self.logger.info("Solved after %f" % (used_time))
-                    break
-                elif used_time >= test_scenario.algorithm_cutoff_time:
-                    stat.timeouts += 1
-                    stat.par1 += test_scenario.algorithm_cutoff_time
-                    self.logger.debug("Timeout after %f (< %f)" % (test_scenario.algorithm_cutoff_time, used_time))
-                    break
-
-            if not solved and used_time < test_scenario.algorithm_cutoff_time:
-                self.logger.warn(
-                    "Schedule ended without using all time: %f" % (test_scenario.algorithm_cutoff_time - used_time))
-                self.logger.warn("Counting as timeout")
-                stat.timeouts += 1
-                stat.par1 += test_scenario.algorithm_cutoff_time
-
-        stat.par10 = stat.par1 + 9 * \
-                     test_scenario.algorithm_cutoff_time * stat.timeouts
+        stat = context.score(schedules)
 
         stat.show()
 
         return stat
 
+    @timed('scoring.validate_many')
+    def validate_many(self, schedules_list: typing.Union[typing.List[dict], typing.Dict[str, dict]],
+                      test_scenario: ASlibScenario, train_scenario: ASlibScenario,
+                      remove_unsolvable: bool = True, n_jobs: typing.Optional[int] = None) -> pd.DataFrame:
+        """
+            validate many submissions (e.g., schedules of different systems)
+            on the same scenario. The oracle, SBS and performance arrays are
+            computed only once.
+
+            Arguments
+            ---------
+            schedules_list: list of dicts (or dict {submission name -> dict})
+                {instance name -> tuples [algo, bugdet]}
+                algorithm schedules per instance, per submission
+            test_scenario: ASlibScenario
+                ASlib scenario with test instances
+            train_scenario: ASlibScenario
+                ASlib scenario with test instances -- required for SBS
+            remove_unsolvable: bool
+                remove unsolvable from stats
+            n_jobs: int
+                if set, submissions are scored in a pool of this many
+                processes
+
+            Returns
+            -------
+            results: pd.DataFrame
+                one row per submission (PAR10 and timeouts are NaN for
+                solution quality scenarios)
+        """
+        if isinstance(schedules_list, dict):
+            names = list(schedules_list.keys())
+            schedules_list = list(schedules_list.values())
+        else:
+            names = list(range(len(schedules_list)))
+
+        context = ScoringContext(test_scenario, train_scenario)
+        for name, schedules in zip(names, schedules_list):
+            if context.missing_instances(schedules):
+                raise ValueError("Missing predictions for %s in submission %s" %
+                                 (context.missing_instances(schedules), name))
+
+        if n_jobs is None:
+            all_stats = [context.score(schedules) for schedules in schedules_list]
+        else:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_process_context,
+                                                        initargs=(context,)) as executor:
+                all_stats = list(executor.map(_score_in_process, schedules_list,
+                                              chunksize=max(1, len(schedules_list) // (4 * n_jobs))))
+
+        results = []
+        for stat in all_stats:
+            results.append({
+                'PAR1': stat.get_par1(remove_unsolvable),
+                # penalties and timeouts are only defined for runtime
+                'PAR10': stat.get_par10(remove_unsolvable) if context.runtime else np.nan,
+                'timeouts': stat.get_time_outs(remove_unsolvable) if context.runtime else np.nan,
+                'solved': stat.solved,
+                'score': stat.get_score(remove_unsolvable),
+                'gap_closed': stat.get_closed_gap(remove_unsolvable),
+            })
+        return pd.DataFrame(results, index=pd.Index(names, name='submission'))
+
+    @timed('scoring.validate_quality')
     def validate_quality(self, schedules: dict, test_scenario: ASlibScenario,
                          train_scenario: ASlibScenario):
         """
@@ -283,64 +368,15 @@ class Validator(object):
 
         self.logger.debug("FYI: Feature costs and algorithm runstatus is ignored")
 
-        if test_scenario.maximize[0]:
-            test_scenario.performance_data *= -1
-            train_scenario.performance_data *= -1
-            self.logger.debug("Removing *-1 in performance data because of maximization")
-
-        stat = Stats(runtime_cutoff=None, maximize=test_scenario.maximize[0])
+        context = ScoringContext(test_scenario, train_scenario)
 
         # ensure that we got predictions for all test instances
-        if set(test_scenario.instances).difference(schedules.keys()):
-            self.logger.error(
-                "Missing predictions for %s" % (set(test_scenario.instances).difference(schedules.keys())))
+        if context.missing_instances(schedules):
+            self.logger.error("Missing predictions for %s" % context.missing_instances(schedules))
             sys.exit(1)
 
-        if test_scenario.maximize[0]:
-            stat.oracle_par10 = test_scenario.performance_data.max(axis=1).sum()
-            sbs = train_scenario.performance_data.sum(axis=0).argmax()
-            stat.sbs_par10 = test_scenario.performance_data.sum(axis=0)[sbs]
-        else:
-            stat.oracle_par10 = test_scenario.performance_data.min(axis=1).sum()
-            sbs = train_scenario.performance_data.sum(axis=0).argmin()
-            stat.sbs_par10 = test_scenario.performance_data.sum(axis=0)[sbs]
-
-        for inst, schedule in schedules.items():
-            if len(schedule) == 0:
-                raise ValueError('Found empty schedule for instance %s' % inst)
-            for entry in schedule:
-                if isinstance(entry, str):
-                    if entry in test_scenario.algorithms:
-                        selected_algo = entry
-                        perf = test_scenario.performance_data[selected_algo][inst]
-                        break
-                    else:
-                        self.logger.debug("Skip %s" % (entry))
-                elif isinstance(entry, list):
-                    entry = entry[0]  # ignore cutoff
-                    if entry in test_scenario.algorithms:
-                        selected_algo = entry
-                        perf = test_scenario.performance_data[selected_algo][inst]
-                        break
-                    else:
-                        self.logger.debug("Skip %s" % (entry))
-                else:
-                    raise ValueError('schedule entries should be of type str or list')
-
-            self.logger.debug("Using %s on %s with performance %f" % (selected_algo, inst, perf))
-
-            stat.par1 += perf
-            stat.solved += 1
-            if test_scenario.maximize[0]:
-                if perf < test_scenario.performance_data[sbs][inst]:
-                    stat.worse_than_sbs += 1
-                    print(
-                        "%s(%.3f) vs %s (%.3f)" % (selected_algo, perf, sbs, test_scenario.performance_data[sbs][inst]))
-            else:
-                if perf > test_scenario.performance_data[sbs][inst]:
-                    stat.worse_than_sbs += 1
-                    print(
-                        "%s(%.3f) vs %s (%.3f)" % (selected_algo, perf, sbs, test_scenario.performance_data[sbs][inst]))
+        stat = context.score(schedules)
+        self.logger.debug("Worse than SBS (%s): %d / %d" % (context.sbs, stat.worse_than_sbs, stat.solved))
 
         stat.show(remove_unsolvable=False)
 
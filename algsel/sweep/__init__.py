@@ -0,0 +1,4 @@
+from .configs import ConfigurationSweep
+from .oasc import evaluate_oasc_scenario, evaluate_oasc_scenarios, schedules_from_predictions
+from .runner import SweepJob, SweepRunner
+from .store import ResultStore, config_hash
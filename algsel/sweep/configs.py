@@ -0,0 +1,113 @@
+import concurrent.futures
+import logging
+import multiprocessing
+import os
+import pickle
+import typing
+
+from .store import config_hash
+
+
+# state of a worker process: the evaluation function and the (read-only) data
+_worker_state = dict()
+
+
+def _init_worker(evaluate: typing.Callable, data: typing.Any) -> None:
+    _worker_state['evaluate'] = evaluate
+    _worker_state['data'] = data
+
+
+def _evaluate_in_worker(configuration: typing.Dict) -> typing.Any:
+    return _worker_state['evaluate'](configuration, _worker_state['data'])
+
+
+class ConfigurationSweep(object):
+
+    def __init__(self, evaluate: typing.Callable[[typing.Dict, typing.Any], typing.Any], data: typing.Any,
+                 cache_dir: typing.Optional[str] = None, n_jobs: typing.Optional[int] = None):
+        """
+        Evaluates many configurations on the same data
+
+            evaluate: callable (configuration, data) -> result
+                evaluates a single configuration (dict). Should be a module
+                level function when using multiple processes
+            data: any
+                loaded once (e.g., train and test frame) and shared read-only
+                with all evaluations. With n_jobs on a platform that forks,
+                workers inherit it without pickling
+            cache_dir: str
+                if set, results are cached as <hash of configuration>.pkl
+            n_jobs: int
+                number of worker processes (None: evaluate in this process)
+        """
+        self.evaluate = evaluate
+        self.data = data
+        self.cache_dir = cache_dir
+        self.n_jobs = n_jobs
+        self.logger = logging.getLogger("ConfigurationSweep")
+
+    def _cache_file(self, key: str) -> typing.Optional[str]:
+        if self.cache_dir is None:
+            return None
+        return os.path.join(self.cache_dir, '%s.pkl' % key)
+
+    def _load_cached(self, key: str) -> typing.Tuple[bool, typing.Any]:
+        cache_file = self._cache_file(key)
+        if cache_file is None or not os.path.isfile(cache_file):
+            return False, None
+        with open(cache_file, 'rb') as fp:
+            return True, pickle.load(fp)
+
+    def _store(self, key: str, result: typing.Any) -> None:
+        cache_file = self._cache_file(key)
+        if cache_file is None:
+            return
+        with open(cache_file + '.tmp', 'wb') as fp:
+            pickle.dump(result, fp)
+        os.replace(cache_file + '.tmp', cache_file)
+
+    def _executor(self) -> concurrent.futures.ProcessPoolExecutor:
+        if 'fork' in multiprocessing.get_all_start_methods():
+            # forked workers share the data of this process (copy on write)
+            _init_worker(self.evaluate, self.data)
+            return concurrent.futures.ProcessPoolExecutor(max_workers=self.n_jobs,
+                                                          mp_context=multiprocessing.get_context('fork'))
+        return concurrent.futures.ProcessPoolExecutor(max_workers=self.n_jobs, initializer=_init_worker,
+                                                      initargs=(self.evaluate, self.data))
+
+    def run(self, configurations: typing.Iterable[typing.Dict]) -> typing.List[typing.Any]:
+        """
+        Evaluates configurations (dicts) and returns the results in the same
+        order. Configurations that were evaluated before (same hash) are
+        taken from the cache, duplicates are evaluated only once.
+        """
+        if self.cache_dir is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        configurations = list(configurations)
+        keys = [config_hash(configuration) for configuration in configurations]
+
+        results = dict()
+        pending = dict()
+        for key, configuration in zip(keys, configurations):
+            if key in results or key in pending:
+                continue
+            cached, result = self._load_cached(key)
+            if cached:
+                results[key] = result
+            else:
+                pending[key] = configuration
+        self.logger.info('%d configurations, %d from cache, %d to evaluate' %
+                         (len(configurations), len(results), len(pending)))
+
+        if self.n_jobs is None:
+            for key, configuration in pending.items():
+                results[key] = self.evaluate(configuration, self.data)
+                self._store(key, results[key])
+        elif pending:
+            with self._executor() as executor:
+                futures = {executor.submit(_evaluate_in_worker, configuration): key
+                           for key, configuration in pending.items()}
+                for future in concurrent.futures.as_completed(futures):
+                    results[futures[future]] = future.result()
+                    self._store(futures[future], results[futures[future]])
+        return [results[key] for key in keys]
@@ -0,0 +1,101 @@
+import concurrent.futures
+import copy
+import logging
+import os
+import pandas as pd
+import time
+import typing
+
+from ..instrumentation import timed
+from ..models import SklearnModelWrapper
+from ..scenario import load_scenario
+from ..scoring.oasc_validator import ScoringContext
+
+
+def schedules_from_predictions(predictions: typing.Dict[str, typing.Dict[str, float]], maximize: bool,
+                               budget: float = 99999) -> typing.Dict[str, typing.List]:
+    """
+    Turns predictions {instance -> {algorithm -> predicted objective}} into
+    schedules that run the best predicted algorithm per instance
+    """
+    schedules = dict()
+    for task_id, pred in predictions.items():
+        if maximize:
+            predicted_algorithm = max(pred, key=pred.get)
+        else:
+            predicted_algorithm = min(pred, key=pred.get)
+        schedules[task_id] = [[predicted_algorithm, budget]]
+    return schedules
+
+
+@timed('sweep.evaluate_oasc_scenario')
+def evaluate_oasc_scenario(oasc_scenario_dir: str, scenario_name: str, models: typing.Dict[str, SklearnModelWrapper],
+                           random_seed: typing.Optional[int] = None, use_cache: bool = True) -> typing.List[typing.Dict]:
+    """
+    Fits, predicts and validates every model (name -> unfitted wrapper) on an
+    oasc scenario. Each file of the scenario is parsed once, for both the
+    frames and the validation (see load_scenario). The models themselves are
+    not modified. Returns a result (dict) per model.
+    """
+    start = time.perf_counter()
+    train = load_scenario(os.path.join(oasc_scenario_dir, 'train', scenario_name), use_cache)
+    test = load_scenario(os.path.join(oasc_scenario_dir, 'test', scenario_name), use_cache)
+    context = ScoringContext(test, train)
+    load_time = time.perf_counter() - start
+    # unsolvable instances are only defined for runtime scenarios
+    remove_unsolvable = context.runtime
+
+    results = []
+    for model_name, meta in models.items():
+        meta = copy.deepcopy(meta)
+        if random_seed is not None:
+            meta.model_template.set_params(**{param: random_seed for param in meta.model_template.get_params()
+                                              if param.endswith('random_state')})
+        logging.info('%s on %s; single model = %s' % (model_name, scenario_name, meta.single))
+        start = time.perf_counter()
+        meta.fit(train.frame)
+        fit_time = time.perf_counter() - start
+        predictions = meta.predict(test.frame)
+        predict_time = time.perf_counter() - start - fit_time
+
+        schedules = schedules_from_predictions(predictions, test.maximize[0])
+        if context.missing_instances(schedules):
+            raise ValueError('Missing predictions for %s on %s' % (context.missing_instances(schedules), scenario_name))
+        stat = context.score(schedules)
+        results.append({
+            'scenario_name': scenario_name,
+            'model': model_name,
+            'PAR1': stat.get_par1(remove_unsolvable),
+            'PAR10': stat.get_par10(remove_unsolvable),
+            'solved': stat.solved,
+            'timeouts': stat.get_time_outs(remove_unsolvable),
+            'score': stat.get_score(remove_unsolvable),
+            'score_sbs': stat.get_score_sbs(remove_unsolvable),
+            'score_oracle': stat.get_score_oracle(remove_unsolvable),
+            'gap_closed': stat.get_closed_gap(remove_unsolvable),
+            'load_time': load_time,
+            'fit_time': fit_time,
+            'predict_time': predict_time,
+        })
+    return results
+
+
+def evaluate_oasc_scenarios(oasc_scenario_dir: str, scenario_names: typing.Iterable[str],
+                            models: typing.Dict[str, SklearnModelWrapper], random_seed: typing.Optional[int] = None,
+                            use_cache: bool = True, n_jobs: typing.Optional[int] = None) -> pd.DataFrame:
+    """
+    Evaluates every model on every oasc scenario (see evaluate_oasc_scenario).
+    If n_jobs is set, the scenarios are loaded and evaluated in a pool of this
+    many processes. Returns a frame with a row per scenario and model.
+    """
+    scenario_names = list(scenario_names)
+    if n_jobs is None:
+        results = [evaluate_oasc_scenario(oasc_scenario_dir, scenario_name, models, random_seed, use_cache)
+                   for scenario_name in scenario_names]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            futures = [executor.submit(evaluate_oasc_scenario, oasc_scenario_dir, scenario_name, models,
+                                       random_seed, use_cache)
+                       for scenario_name in scenario_names]
+            results = [future.result() for future in futures]
+    return pd.DataFrame([row for rows in results for row in rows]).set_index(['scenario_name', 'model'])
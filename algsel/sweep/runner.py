@@ -0,0 +1,133 @@
+import concurrent.futures
+import logging
+import os
+import re
+import signal
+import subprocess
+import threading
+import typing
+
+
+class SweepJob(object):
+
+    def __init__(self, key: typing.Dict, prepare: typing.Callable[[], str],
+                 collect: typing.Callable[[], typing.Any], cwd: typing.Optional[str] = None,
+                 cleanup: typing.Optional[typing.Callable[[], None]] = None):
+        """
+        A single run of an external process in a sweep
+
+            key: dict
+                identifies the job, e.g., {scenario_name, repetition, fold, seed}
+            prepare: callable
+                prepares the job (e.g., exports the fold) and returns the
+                shell command to execute
+            collect: callable
+                called after the command finished successfully, returns the
+                result of the job
+            cwd: str
+                working directory of the command
+            cleanup: callable
+                called after the job, also if it failed (e.g., removes the
+                exported fold)
+        """
+        self.key = key
+        self.prepare = prepare
+        self.collect = collect
+        self.cwd = cwd
+        self.cleanup = cleanup
+
+    @property
+    def name(self) -> str:
+        name = '_'.join('%s%s' % (key, value) for key, value in self.key.items())
+        return re.sub(r'[^\w.-]', '_', name)
+
+
+class SweepRunner(object):
+
+    STATUS_OK = 'ok'
+    STATUS_FAILED = 'failed'
+    STATUS_TIMEOUT = 'timeout'
+    STATUS_ERROR = 'error'
+
+    def __init__(self, log_dir: str, n_parallel: int = 1, timeout: typing.Optional[float] = None,
+                 on_result: typing.Optional[typing.Callable[[SweepJob, typing.Any], None]] = None):
+        """
+        Runs the external processes of sweep jobs in parallel
+
+            log_dir: str
+                stdout and stderr of every job are written to
+                log_dir/<job name>.log
+            n_parallel: int
+                number of processes that run at the same time
+            timeout: float
+                seconds after which a process is killed (None: no limit)
+            on_result: callable (job, result)
+                called (one at a time) as soon as a job finished successfully
+        """
+        self.log_dir = log_dir
+        self.n_parallel = n_parallel
+        self.timeout = timeout
+        self.on_result = on_result
+        self.logger = logging.getLogger("SweepRunner")
+        self._result_lock = threading.Lock()
+
+    def _execute(self, job: SweepJob) -> str:
+        command = job.prepare()
+        log_file = os.path.join(self.log_dir, '%s.log' % job.name)
+        self.logger.info('Running %s: %s (log: %s)' % (job.key, command, log_file))
+        with open(log_file, 'w') as log_fp:
+            process = subprocess.Popen(command, shell=True, stdout=log_fp, stderr=subprocess.STDOUT,
+                                       cwd=job.cwd, start_new_session=True)
+            try:
+                retval = process.wait(timeout=self.timeout)
+            except subprocess.TimeoutExpired:
+                # kill the whole process group, the command runs in a shell
+                os.killpg(process.pid, signal.SIGKILL)
+                process.wait()
+                self.logger.error('Job %s timed out after %s seconds' % (job.key, self.timeout))
+                return self.STATUS_TIMEOUT
+        if retval != 0:
+            self.logger.error('Job %s failed with exit code %d, see %s' % (job.key, retval, log_file))
+            return self.STATUS_FAILED
+
+        result = job.collect()
+        if self.on_result is not None:
+            with self._result_lock:
+                self.on_result(job, result)
+        return self.STATUS_OK
+
+    def _execute_safe(self, job: SweepJob) -> str:
+        try:
+            return self._execute(job)
+        except Exception:
+            self.logger.exception('Error while running job %s' % job.key)
+            return self.STATUS_ERROR
+        finally:
+            if job.cleanup is not None:
+                try:
+                    job.cleanup()
+                except Exception:
+                    self.logger.exception('Error while cleaning up job %s' % job.key)
+
+    def run(self, jobs: typing.Iterable[SweepJob]) -> typing.List[typing.Tuple[typing.Dict, str]]:
+        """
+        Runs all jobs and returns the status of every job (in order of jobs).
+        Jobs are taken from the iterable only when a process slot is free, so
+        a generator can load the data of a job (e.g., its scenario) lazily;
+        finished jobs are released.
+        """
+        os.makedirs(self.log_dir, exist_ok=True)
+        keys, statuses = [], dict()
+        running = dict()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.n_parallel) as executor:
+            for job in jobs:
+                if len(running) >= self.n_parallel:
+                    done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        statuses[running.pop(future)] = future.result()
+                running[executor.submit(self._execute_safe, job)] = len(keys)
+                keys.append(job.key)
+                del job  # only the executor holds a running job
+            for future in concurrent.futures.as_completed(running):
+                statuses[running[future]] = future.result()
+        return [(key, statuses[idx]) for idx, key in enumerate(keys)]
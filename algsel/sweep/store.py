@@ -0,0 +1,82 @@
+import contextlib
+import hashlib
+import json
+import pandas as pd
+import sqlite3
+import typing
+
+
+def config_hash(config: typing.Dict) -> str:
+    """
+    Returns a stable hash of a (json serializable) configuration
+    """
+    return hashlib.sha1(json.dumps(config, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+class ResultStore(object):
+
+    KEY_FIELDS = ('scenario_name', 'strategy_name', 'repetition', 'fold', 'seed', 'config_hash')
+
+    def __init__(self, path: str):
+        """
+        Store of sweep results in a local SQLite file. Every result is
+        identified by (scenario, strategy, repetition, fold, seed, config
+        hash); storing a result with an existing key replaces it, so a rerun
+        of a job overwrites its earlier result.
+        """
+        self.path = path
+        with self._connect() as connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS results ('
+                               'scenario_name TEXT NOT NULL, strategy_name TEXT NOT NULL, '
+                               'repetition INTEGER NOT NULL, fold INTEGER NOT NULL, seed INTEGER NOT NULL, '
+                               'config_hash TEXT NOT NULL, PAR10_score REAL, '
+                               'PRIMARY KEY (%s))' % ', '.join(self.KEY_FIELDS))
+
+    @contextlib.contextmanager
+    def _connect(self) -> typing.Iterator[sqlite3.Connection]:
+        # a connection per operation, so the store can be used from threads
+        connection = sqlite3.connect(self.path, timeout=60)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def is_done(self, scenario_name: str, strategy_name: str, repetition: int, fold: int, seed: int,
+                config_hash: str) -> bool:
+        with self._connect() as connection:
+            cursor = connection.execute('SELECT 1 FROM results WHERE %s' %
+                                        ' AND '.join('%s = ?' % field for field in self.KEY_FIELDS),
+                                        (scenario_name, strategy_name, repetition, fold, seed, config_hash))
+            return cursor.fetchone() is not None
+
+    def add(self, rows: typing.Iterable[typing.Dict]) -> None:
+        """
+        Stores results (dicts with the key fields and PAR10_score) in a single
+        transaction
+        """
+        fields = self.KEY_FIELDS + ('PAR10_score',)
+        with self._connect() as connection:
+            connection.executemany('INSERT OR REPLACE INTO results (%s) VALUES (%s)' %
+                                   (', '.join(fields), ', '.join('?' * len(fields))),
+                                   [tuple(row[field] for field in fields) for row in rows])
+
+    def to_frame(self, scenario_name: typing.Optional[str] = None,
+                 config_hash: typing.Optional[str] = None) -> pd.DataFrame:
+        """
+        Returns the stored results, optionally only of a scenario and / or
+        configuration
+        """
+        conditions, parameters = [], []
+        if scenario_name is not None:
+            conditions.append('scenario_name = ?')
+            parameters.append(scenario_name)
+        if config_hash is not None:
+            conditions.append('config_hash = ?')
+            parameters.append(config_hash)
+        query = 'SELECT * FROM results'
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        with self._connect() as connection:
+            return pd.read_sql_query(query, connection, params=parameters)
@@ -0,0 +1,42 @@
+import argparse
+import json
+import pandas as pd
+import sys
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Compares two benchmark result files (e.g., of two commits)')
+    parser.add_argument('baseline', type=str)
+    parser.add_argument('candidate', type=str)
+    parser.add_argument('--threshold', type=float, default=1.1,
+                        help='exit with an error if a stage is slower by more than this factor')
+    return parser.parse_args()
+
+
+def load(path):
+    with open(path, 'r') as fp:
+        results = json.load(fp)
+    return pd.DataFrame(results['results']).set_index(['size', 'stage'])[['min', 'peak_memory']], \
+        results['environment']
+
+
+def run(args):
+    baseline, baseline_environment = load(args.baseline)
+    candidate, candidate_environment = load(args.candidate)
+    print('baseline:  %s' % baseline_environment['commit'])
+    print('candidate: %s' % candidate_environment['commit'])
+
+    comparison = baseline.join(candidate, lsuffix='_baseline', rsuffix='_candidate', how='inner')
+    comparison['time_ratio'] = comparison['min_candidate'] / comparison['min_baseline']
+    comparison['memory_ratio'] = comparison['peak_memory_candidate'] / comparison['peak_memory_baseline']
+    with pd.option_context('display.width', 200, 'display.max_rows', None, 'display.max_columns', None):
+        print(comparison)
+
+    regressions = comparison[comparison['time_ratio'] > args.threshold]
+    if len(regressions) > 0:
+        print('Slower than %.2fx: %s' % (args.threshold, list(regressions.index)))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    run(parse_args())
@@ -0,0 +1,199 @@
+import algsel
+import argparse
+import aslib_scenario
+import itertools
+import json
+import logging
+import numpy as np
+import os
+import pandas as pd
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+import sklearn
+
+import sklearn.ensemble
+import sklearn.pipeline
+
+from .synthetic import make_scenario
+
+try:
+    from sklearn.impute import SimpleImputer as Imputer
+except ImportError:
+    from sklearn.preprocessing import Imputer
+
+
+SIZES = {
+    'small': {'n_instances': 500, 'n_algorithms': 10, 'n_features': 20, 'n_repetitions': 1},
+    'medium': {'n_instances': 2000, 'n_algorithms': 20, 'n_features': 50, 'n_repetitions': 3},
+    'large': {'n_instances': 10000, 'n_algorithms': 30, 'n_features': 100, 'n_repetitions': 10},
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Times the hot paths of algsel on synthetic ASlib scenarios '
+                                                 '(run from the repository root as '
+                                                 'python -m benchmarks.run_benchmarks)')
+    parser.add_argument('--sizes', type=str, nargs='+', default=['small'], choices=list(SIZES.keys()))
+    parser.add_argument('--n_instances', type=int, nargs='+', default=None, help='custom grid (overrides sizes)')
+    parser.add_argument('--n_algorithms', type=int, nargs='+', default=[10])
+    parser.add_argument('--n_features', type=int, nargs='+', default=[20])
+    parser.add_argument('--n_repetitions', type=int, nargs='+', default=[1])
+    parser.add_argument('--repeats', type=int, default=3, help='timed runs per stage (the minimum is reported)')
+    parser.add_argument('--memory', action='store_true', default=False,
+                        help='measure peak memory per stage with tracemalloc (an extra, untimed run)')
+    parser.add_argument('--n_estimators', type=int, default=16)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--work_dir', type=str, default=None, help='defaults to a temporary directory')
+    parser.add_argument('--output', type=str, default='benchmark_results.json')
+    return parser.parse_args()
+
+
+def get_environment():
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL,
+                                         cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'sklearn': sklearn.__version__,
+    }
+
+
+def measure(function, repeats, memory):
+    """
+    Runs function repeats times and returns its (last) result and the
+    timings, and optionally the tracemalloc peak (bytes) of an extra run
+    """
+    times = []
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    peak_memory = None
+    if memory:
+        tracemalloc.start()
+        function()
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return result, {'times': times, 'min': min(times), 'median': float(np.median(times)), 'peak_memory': peak_memory}
+
+
+def select(predictions):
+    return {instance: [[min(scores, key=scores.get), 99999]] for instance, scores in predictions.items()}
+
+
+def run_size(args, size_name, params, work_dir):
+    scenario_name = 'synthetic_%s' % size_name
+    scenario_folder = os.path.join(work_dir, 'aslib', scenario_name)
+    oasc_folder = os.path.join(work_dir, 'oasc')
+    make_scenario(scenario_folder, seed=args.seed, **params)
+
+    def run_stage(stage, function, repeats=args.repeats):
+        result, timing = measure(function, repeats, args.memory)
+        logging.info('%s %-16s %8.3fs' % (size_name, stage, timing['min']))
+        results.append(dict(size=size_name, stage=stage, **params, **timing))
+        return result
+
+    results = []
+    runs_file = os.path.join(scenario_folder, 'algorithm_runs.arff')
+    features_file = os.path.join(scenario_folder, 'feature_values.arff')
+    status_file = os.path.join(scenario_folder, 'feature_runstatus.arff')
+    run_stage('load_arff', lambda: algsel.scenario.obtain_dataframe_scenario(features_file, runs_file, status_file,
+                                                                             use_cache=False))
+    algsel.scenario.obtain_dataframe_scenario(features_file, runs_file, status_file)  # warm the cache
+    run_stage('load_cached', lambda: algsel.scenario.obtain_dataframe_scenario(features_file, runs_file, status_file))
+
+    scenario = run_stage('cv_scenario', lambda: algsel.scenario.CVScenario(scenario_folder, use_cache=False))
+    run_stage('get_fold', lambda: [scenario.get_fold(test_set, repetition, fold)
+                                   for repetition in range(1, params['n_repetitions'] + 1)
+                                   for fold in range(1, 11) for test_set in (True, False)])
+    run_stage('export_fold', lambda: algsel.scenario.save_scenario_in_oasc_format(
+        scenario_folder, scenario_name, oasc_folder, 1, 1, scenario=scenario))
+
+    train_frame, test_frame, _ = algsel.scenario.get_oasc_train_and_test_frame(oasc_folder, scenario_name)
+    # a prediction per instance and algorithm
+    test_frame = test_frame[test_frame['repetition'] == 1]
+    test_scenario = run_stage('read_aslib', lambda: _read_aslib_scenario(oasc_folder, 'test', scenario_name))
+    train_scenario = _read_aslib_scenario(oasc_folder, 'train', scenario_name)
+
+    for single in [True, False]:
+        mode = 'single' if single else 'multi'
+        pipeline = sklearn.pipeline.Pipeline(steps=[
+            ('imputer', Imputer()),
+            ('classifier', sklearn.ensemble.RandomForestRegressor(n_estimators=args.n_estimators,
+                                                                  random_state=args.seed))])
+        meta = algsel.models.SklearnModelWrapper(pipeline, single)
+        run_stage('fit_%s' % mode, lambda: meta.fit(train_frame))
+        predictions = run_stage('predict_%s' % mode, lambda: meta.predict(test_frame))
+
+    schedules = select(predictions)
+    validator = algsel.scoring.Validator()
+    run_stage('validate', lambda: validator.validate_runtime(schedules, test_scenario, train_scenario))
+
+    # the same size as a solution quality scenario, with a random algorithm
+    # per instance (scoring does not depend on how it was selected)
+    quality_name = '%s_quality' % scenario_name
+    quality_folder = os.path.join(work_dir, 'aslib', quality_name)
+    make_scenario(quality_folder, runtime=False, maximize=True, seed=args.seed, **params)
+    algsel.scenario.save_scenario_in_oasc_format(quality_folder, quality_name, oasc_folder, 1, 1)
+    quality_test = _read_aslib_scenario(oasc_folder, 'test', quality_name)
+    quality_train = _read_aslib_scenario(oasc_folder, 'train', quality_name)
+    rng = np.random.RandomState(args.seed)
+    quality_schedules = {instance: [[quality_test.algorithms[rng.randint(len(quality_test.algorithms))], 99999]]
+                         for instance in quality_test.instances}
+    run_stage('validate_quality', lambda: validator.validate_quality(quality_schedules, quality_test, quality_train))
+    return results
+
+
+def _read_aslib_scenario(oasc_folder, subset, scenario_name):
+    scenario = aslib_scenario.aslib_scenario.ASlibScenario()
+    scenario.read_scenario(dn=os.path.join(oasc_folder, subset, scenario_name))
+    return scenario
+
+
+def run(args):
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    for name in ['Stats', 'Validation', 'RuntimeArrays', 'QualityArrays']:
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    if args.n_instances is not None:
+        sizes = {}
+        for n_instances, n_algorithms, n_features, n_repetitions in itertools.product(
+                args.n_instances, args.n_algorithms, args.n_features, args.n_repetitions):
+            sizes['i%d_a%d_f%d_r%d' % (n_instances, n_algorithms, n_features, n_repetitions)] = {
+                'n_instances': n_instances, 'n_algorithms': n_algorithms,
+                'n_features': n_features, 'n_repetitions': n_repetitions}
+    else:
+        sizes = {name: SIZES[name] for name in args.sizes}
+
+    work_dir = args.work_dir or tempfile.mkdtemp('_algsel_benchmark')
+    # keep the arff cache of the benchmark apart from the user cache
+    os.environ['ALGSEL_CACHE_DIR'] = os.path.join(work_dir, 'cache')
+    try:
+        results = []
+        for size_name, params in sizes.items():
+            results.extend(run_size(args, size_name, params, work_dir))
+    finally:
+        if args.work_dir is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    with open(args.output, 'w') as fp:
+        json.dump({'environment': get_environment(), 'results': results}, fp, indent=2)
+    logging.info('Results written to %s' % args.output)
+
+
+if __name__ == '__main__':
+    run(parse_args())
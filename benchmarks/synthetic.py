@@ -0,0 +1,101 @@
+import algsel
+import numpy as np
+import os
+import pandas as pd
+import yaml
+
+
+RUNSTATUS_VALUES = ['ok', 'timeout', 'memout', 'not_applicable', 'crash', 'other']
+FEATURE_RUNSTATUS_VALUES = ['ok', 'timeout', 'memout', 'presolved', 'crash', 'other', 'unknown']
+
+
+def make_scenario(scenario_folder, n_instances, n_algorithms, n_features, n_repetitions=1, n_folds=10,
+                  runtime=True, cutoff=3600.0, maximize=False, seed=0):
+    """
+    Writes a synthetic ASlib scenario (all files needed by algsel.scenario and
+    ASlibScenario.read_scenario) with a single feature step. Runtimes are log
+    uniform, 20% of the runs time out and 5% of the feature values are
+    missing. Every run (and feature vector) is repeated n_repetitions times,
+    which is also the number of cross-validation repetitions. Without
+    runtime, the scenario holds solution qualities, to be maximized with
+    maximize.
+    """
+    rng = np.random.RandomState(seed)
+    os.makedirs(scenario_folder, exist_ok=True)
+    instances = np.array(['instance_%d' % idx for idx in range(n_instances)], dtype=object)
+    algorithms = np.array(['algorithm_%d' % idx for idx in range(n_algorithms)], dtype=object)
+    repetitions = np.arange(1, n_repetitions + 1)
+    features = ['feature_%d' % idx for idx in range(n_features)]
+    objective = 'runtime' if runtime else 'quality'
+
+    # a row per instance, repetition and algorithm
+    n_runs = n_instances * n_repetitions * n_algorithms
+    if runtime:
+        performance = np.exp(rng.uniform(np.log(0.01), np.log(cutoff), n_runs))
+        runstatus = np.where(rng.rand(n_runs) < 0.2, 'timeout', 'ok')
+        performance[runstatus == 'timeout'] = cutoff
+    else:
+        performance = rng.rand(n_runs) * 100
+        runstatus = np.full(n_runs, 'ok')
+    algorithm_runs = pd.DataFrame({
+        'instance_id': np.repeat(instances, n_repetitions * n_algorithms),
+        'repetition': np.tile(np.repeat(repetitions, n_algorithms), n_instances),
+        'algorithm': np.tile(algorithms, n_instances * n_repetitions),
+        objective: performance,
+        'runstatus': runstatus,
+    })
+    algsel.scenario.write_arff(algorithm_runs, 'algorithm_runs', os.path.join(scenario_folder, 'algorithm_runs.arff'),
+                               [('instance_id', 'STRING'), ('repetition', 'NUMERIC'), ('algorithm', 'STRING'),
+                                (objective, 'NUMERIC'), ('runstatus', RUNSTATUS_VALUES)])
+
+    # the features are deterministic: the same values in every repetition
+    values = rng.rand(n_instances, n_features)
+    values[rng.rand(n_instances, n_features) < 0.05] = np.nan
+    feature_instances = np.repeat(instances, n_repetitions)
+    feature_repetitions = np.tile(repetitions, n_instances)
+    feature_values = pd.DataFrame(np.repeat(values, n_repetitions, axis=0), columns=features)
+    feature_values.insert(0, 'repetition', feature_repetitions)
+    feature_values.insert(0, 'instance_id', feature_instances)
+    algsel.scenario.write_arff(feature_values, 'feature_values', os.path.join(scenario_folder, 'feature_values.arff'),
+                               [('instance_id', 'STRING'), ('repetition', 'NUMERIC')] +
+                               [(feature, 'NUMERIC') for feature in features])
+
+    step_status = np.where(rng.rand(n_instances) < 0.05, 'presolved', 'ok')
+    feature_runstatus = pd.DataFrame({'instance_id': feature_instances, 'repetition': feature_repetitions,
+                                      'step_1': np.repeat(step_status, n_repetitions)})
+    algsel.scenario.write_arff(feature_runstatus, 'feature_runstatus',
+                               os.path.join(scenario_folder, 'feature_runstatus.arff'),
+                               [('instance_id', 'STRING'), ('repetition', 'NUMERIC'),
+                                ('step_1', FEATURE_RUNSTATUS_VALUES)])
+
+    feature_costs = pd.DataFrame({'instance_id': feature_instances, 'repetition': feature_repetitions,
+                                  'step_1': rng.rand(n_instances * n_repetitions)})
+    algsel.scenario.write_arff(feature_costs, 'feature_costs', os.path.join(scenario_folder, 'feature_costs.arff'),
+                               [('instance_id', 'STRING'), ('repetition', 'NUMERIC'), ('step_1', 'NUMERIC')])
+
+    cv = pd.DataFrame({
+        'instance_id': np.tile(instances, n_repetitions),
+        'repetition': np.repeat(np.arange(1, n_repetitions + 1), n_instances),
+        'fold': np.concatenate([rng.permutation(n_instances) % n_folds + 1 for _ in range(n_repetitions)]),
+    })
+    algsel.scenario.write_arff(cv, 'cv', os.path.join(scenario_folder, 'cv.arff'),
+                               [('instance_id', 'STRING'), ('repetition', 'NUMERIC'), ('fold', 'NUMERIC')])
+
+    description = {
+        'scenario_id': os.path.basename(os.path.normpath(scenario_folder)),
+        'performance_measures': [objective],
+        'maximize': [bool(maximize)],
+        'performance_type': ['runtime' if runtime else 'solution_quality'],
+        'algorithm_cutoff_time': cutoff if runtime else None,
+        'algorithm_cutoff_memory': '?',
+        'features_cutoff_time': cutoff if runtime else None,
+        'features_cutoff_memory': '?',
+        'features_deterministic': features,
+        'features_stochastic': None,
+        'number_of_feature_steps': 1,
+        'default_steps': ['step_1'],
+        'feature_steps': {'step_1': {'provides': features}},
+        'metainfo_algorithms': {algorithm: {'configuration': '', 'deterministic': n_repetitions == 1} for algorithm in algorithms},
+    }
+    with open(os.path.join(scenario_folder, 'description.txt'), 'w') as fp:
+        yaml.safe_dump(description, fp, default_flow_style=False)
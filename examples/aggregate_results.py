@@ -1,28 +1,29 @@
+import algsel
 import argparse
 import os
-import pandas as pd
 
 
 def parse_args():
     parser = argparse.ArgumentParser()
     parser.add_argument('--scenario_name', type=str, default='OPENML-WEKA-2017')
-    parser.add_argument('--output_dir', type=str, default=os.path.expanduser('~/experiments/as_insights/ASAPv2'))
+    parser.add_argument('--results_db', type=str, default=os.path.expanduser('~/experiments/as_insights/ASAPv2/results.sqlite'))
     parser.add_argument('--n_repetitions', type=int, default=1)
     parser.add_argument('--n_folds', type=int, default=10)
     parser.add_argument('--n_seeds', type=int, default=3)
+    parser.add_argument('--config_hash', type=str, default=None,
+                        help='only aggregate the results of this configuration (command)')
 
     return parser.parse_args()
 
 
 def run(args):
-    path = os.path.join(args.output_dir, "%s_r%d_f%d_s%d.csv" % (args.scenario_name,
-                                                                 args.n_repetitions,
-                                                                 args.n_folds,
-                                                                 args.n_seeds))
-    frame = pd.read_csv(path)
-    del frame['fold']
-    del frame['repetition']
-    frame = frame.groupby(by=['scenario_name', 'seed', 'strategy_name']).agg('mean')
+    frame = algsel.sweep.ResultStore(args.results_db).to_frame(scenario_name=args.scenario_name,
+                                                               config_hash=args.config_hash)
+    frame = frame.loc[(frame['repetition'] <= args.n_repetitions) &
+                      (frame['fold'] <= args.n_folds) &
+                      (frame['seed'] <= args.n_seeds)]
+    # results of different configurations (commands) are never averaged together
+    frame = frame.groupby(by=['scenario_name', 'config_hash', 'seed', 'strategy_name'])[['PAR10_score']].agg('mean')
     print(frame)
 
 
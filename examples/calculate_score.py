@@ -14,7 +14,7 @@ def parse_args():
                                                                       'calculated: as the best on the train set or ' +
                                                                       'the best on the test set. ')
     parser.add_argument('--submissions_dir', type=str, default='../../oasc/submissions/')
-    parser.add_argument('--system', type=str, default='ASAP.v2')
+    parser.add_argument('--system', type=str, nargs='+', default=['ASAP.v2'])
     return parser.parse_args()
 
 
@@ -30,14 +30,20 @@ if __name__ == '__main__':
     train_scenario = aslib_scenario.aslib_scenario.ASlibScenario()
     train_scenario.read_scenario(dn=os.path.join(args.oasc_scenario_dir, 'train', args.scenario_name))
 
-    # read schedule
-    schedule_file = args.submissions_dir + '/' + args.system + '/' + args.scenario_name + '.json'
-    with open(schedule_file) as fp:
-        schedules = json.load(fp)
+    # read schedules
+    all_schedules = dict()
+    for system in args.system:
+        schedule_file = args.submissions_dir + '/' + system + '/' + args.scenario_name + '.json'
+        with open(schedule_file) as fp:
+            all_schedules[system] = json.load(fp)
 
     validator = algsel.scoring.Validator()
 
-    if test_scenario.performance_type[0] == 'runtime':
-        validator.validate_runtime(schedules=schedules, test_scenario=test_scenario, train_scenario=train_scenario)
+    if len(all_schedules) > 1:
+        print(validator.validate_many(all_schedules, test_scenario=test_scenario, train_scenario=train_scenario))
+    elif test_scenario.performance_type[0] == 'runtime':
+        validator.validate_runtime(schedules=all_schedules[args.system[0]], test_scenario=test_scenario,
+                                   train_scenario=train_scenario)
     else:
-        validator.validate_quality(schedules=schedules, test_scenario=test_scenario, train_scenario=train_scenario)
+        validator.validate_quality(schedules=all_schedules[args.system[0]], test_scenario=test_scenario,
+                                   train_scenario=train_scenario)
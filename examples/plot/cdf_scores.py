@@ -1,5 +1,7 @@
 import algsel
 import argparse
+import aslib_scenario
+import json
 import matplotlib.pyplot as plt
 import numpy as np
 import os
@@ -10,16 +12,27 @@ def parse_args():
     parser.add_argument('--oasc_scenario_dir', type=str, default='../../oasc/oasc_scenarios/')
     parser.add_argument('--scenario_name', type=str, default='Camilla')
     parser.add_argument('--results_dir', type=str, default='../../oasc/camilla_analysis/results')
+    parser.add_argument('--n_jobs', type=int, default=None)
     return parser.parse_args()
 
 
 if __name__ == '__main__':
     args = parse_args()
-    scores = []
+
+    # read scenarios
+    test_scenario = aslib_scenario.aslib_scenario.ASlibScenario()
+    test_scenario.read_scenario(dn=os.path.join(args.oasc_scenario_dir, 'test', args.scenario_name))
+    train_scenario = aslib_scenario.aslib_scenario.ASlibScenario()
+    train_scenario.read_scenario(dn=os.path.join(args.oasc_scenario_dir, 'train', args.scenario_name))
+
+    # read all schedules and score them at once
+    all_schedules = dict()
     for file in os.listdir(args.results_dir):
-        schedule = os.path.join(args.results_dir, file)
-        _, gap, _, _, _ = algsel.utils.calculate_oasc_score(args.oasc_scenario_dir, args.scenario_name, schedule)
-        scores.append(gap)
+        with open(os.path.join(args.results_dir, file)) as fp:
+            all_schedules[file] = json.load(fp)
+    results = algsel.scoring.Validator().validate_many(all_schedules, test_scenario, train_scenario,
+                                                       n_jobs=args.n_jobs)
+    scores = results['gap_closed'].tolist()
 
     np.random.seed(0)
 
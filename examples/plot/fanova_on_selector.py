@@ -6,16 +6,18 @@ from fanova.visualizer import Visualizer
 import matplotlib.pyplot as plt
 import numpy as np
 import os
-import pickle
 import sklearn
 
-from examples.run_on_oasc import run_on_scenario
+from examples.run_on_oasc import run_on_frames
 
 import sklearn.pipeline
 import sklearn.preprocessing
 import sklearn.ensemble
 
 
+RANDOM_SEED = 42
+
+
 def parse_args():
     parser = argparse.ArgumentParser(description='Runs a sklearn algorithm on ASLib splits')
     parser.add_argument('--oasc_scenario_dir', type=str, default='../../oasc/oasc_scenarios/')
@@ -25,6 +27,7 @@ def parse_args():
     parser.add_argument('--repeats', type=int, default=10)
     parser.add_argument('--optimization_runs', type=int, default=400)
     parser.add_argument('--model', type=str, default='forest_256')
+    parser.add_argument('--n_jobs', type=int, default=None)
     parser.add_argument('--verbose', action='store_true', default=False)
     return parser.parse_args()
 
@@ -46,31 +49,29 @@ def get_config_space():
     return cs
 
 
-def run_iteration(args, iteration_id, config):
-    cache_dir = os.path.join(args.cache_dir, args.scenario_name)
-    try:
-        os.makedirs(cache_dir)
-    except FileExistsError:
-        pass
-    cache_file = os.path.join(cache_dir, str(iteration_id) + '.pkl')
-    if os.path.isfile(cache_file):
-        with open(cache_file, 'rb') as fp:
-            print('Loaded iteration %d from cache' %iteration_id)
-            return pickle.load(fp)
+def evaluate_configuration(sklearn_params, data):
+    train_frame, test_frame, description, scoring_context = data
 
     pipeline = sklearn.pipeline.Pipeline(steps=[('imputer', sklearn.preprocessing.Imputer()),
                                                 ('classifier', sklearn.ensemble.RandomForestRegressor())])
-    sklearn_params = config.get_dictionary()
-    single_model = sklearn_params['single_model']
-    del sklearn_params['single_model']
+    sklearn_params = dict(sklearn_params)
+    single_model = sklearn_params.pop('single_model') == 'True'
+    sklearn_params['classifier__bootstrap'] = sklearn_params['classifier__bootstrap'] == 'True'
     pipeline.set_params(**sklearn_params)
     meta = algsel.models.SklearnModelWrapper(pipeline, single_model)
-    result = run_on_scenario(args.oasc_scenario_dir, args.scenario_name, meta, args.repeats, args.verbose)
+    schedules = run_on_frames(train_frame, test_frame, description['maximize'][0], meta, RANDOM_SEED)
+    return schedules, scoring_context.score(schedules).get_score(False)
 
-    with open(cache_file, 'wb') as fp:
-        pickle.dump(result, fp)
 
-    return result
+def load_data(args):
+    """
+    Loads everything that is shared by all configurations (only once)
+    """
+    # each file is parsed once, for both the frames and the validation
+    train = algsel.scenario.load_scenario(os.path.join(args.oasc_scenario_dir, 'train', args.scenario_name))
+    test = algsel.scenario.load_scenario(os.path.join(args.oasc_scenario_dir, 'test', args.scenario_name))
+    scoring_context = algsel.scoring.oasc_validator.ScoringContext(test, train)
+    return train.frame, test.frame, test.description, scoring_context
 
 
 def _plot_fanova(fANOVA, configspace, directory):
@@ -119,14 +120,13 @@ def _do_fanova(config_space, configurations, performances, upper_cutoff):
 def run(args):
     config_space = get_config_space()
     configurations = config_space.sample_configuration(args.optimization_runs)
-    performances = list()
-
-    for idx, configuration in enumerate(configurations):
-        result = run_iteration(args, idx, configuration)
 
-        # first save the results before doing fanova:
-        # paralleling and robustness
-        performances.append(result[1])
+    # results are cached per configuration, before doing fanova
+    sweep = algsel.sweep.ConfigurationSweep(evaluate_configuration, load_data(args),
+                                            cache_dir=os.path.join(args.cache_dir, args.scenario_name),
+                                            n_jobs=args.n_jobs)
+    results = sweep.run([configuration.get_dictionary() for configuration in configurations])
+    performances = [result[1] for result in results]
     print(performances)
     evaluator = _do_fanova(config_space, configurations, performances, args.upper_cutoff)
 
@@ -1,9 +1,6 @@
 import algsel
-import aslib_scenario
 import argparse
 import logging
-import operator
-import os
 import pandas as pd
 import sklearn
 
@@ -19,26 +16,16 @@ def parse_args():
     parser.add_argument('--random_seed', type=int, default=42)
     parser.add_argument('--impute', type=str, default='median')
     parser.add_argument('--model', type=str, default='forest_256')
+    parser.add_argument('--n_jobs', type=int, default=None, help='number of scenarios evaluated in parallel')
     parser.add_argument('--verbose', action='store_true', default=False)
     return parser.parse_args()
 
 
-def run_on_scenario(oasc_scenario_dir, scenario_name, meta, random_seed):
-    train_frame, test_frame, description = algsel.scenario.get_oasc_train_and_test_frame(oasc_scenario_dir, scenario_name)
-    maximize = description['maximize'][0]
-
+def run_on_frames(train_frame, test_frame, maximize, meta, random_seed):
     meta.model_template.set_params(classifier__random_state=random_seed)
     meta.fit(train_frame)
     predictions = meta.predict(test_frame)
-
-    return_format = dict()
-    for task_id, pred in predictions.items():
-        if maximize:
-            predicted_algorithm = max(pred.items(), key=operator.itemgetter(1))[0]
-        else:
-            predicted_algorithm = min(pred.items(), key=operator.itemgetter(1))[0]
-        return_format[task_id] = [[predicted_algorithm, 99999]]
-    return return_format
+    return algsel.sweep.schedules_from_predictions(predictions, maximize)
 
 
 def run(args):
@@ -63,24 +50,15 @@ def run(args):
     pipeline = sklearn.pipeline.Pipeline(steps=[('imputer', sklearn.preprocessing.Imputer(strategy=args.impute)),
                                                 ('classifier', models[args.model])])
 
-    for scenario_name in scenarios:
-        for single_model in [True, False]:
-            meta = algsel.models.SklearnModelWrapper(pipeline, single_model)
-            logging.info('%s on %s; single model = %s' % (args.model, scenario_name, single_model))
-            schedules = run_on_scenario(args.oasc_scenario_dir, scenario_name, meta, args.random_seed)
-
-            print(schedules)
-
-            # read scenarios
-            test_scenario = aslib_scenario.aslib_scenario.ASlibScenario()
-            test_scenario.read_scenario(dn=os.path.join(args.oasc_scenario_dir, 'test', scenario_name))
-            train_scenario = aslib_scenario.aslib_scenario.ASlibScenario()
-            train_scenario.read_scenario(dn=os.path.join(args.oasc_scenario_dir, 'train', scenario_name))
-
-            validator = algsel.scoring.Validator()
-            # this script assumes quality scenario
-            validator.validate_quality(schedules=schedules, test_scenario=test_scenario,
-                                       train_scenario=train_scenario)
+    metas = {
+        '%s_single_model_%s' % (args.model, single_model): algsel.models.SklearnModelWrapper(pipeline, single_model)
+        for single_model in [True, False]
+    }
+    # scenarios are loaded and evaluated in parallel, a row per scenario and model
+    results = algsel.sweep.evaluate_oasc_scenarios(args.oasc_scenario_dir, scenarios, metas, args.random_seed,
+                                                   n_jobs=args.n_jobs)
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print(results)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,49 @@
+import algsel
+import argparse
+import logging
+import os
+import sklearn
+
+import sklearn.pipeline
+import sklearn.preprocessing
+import sklearn.ensemble
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Fits a selector on an OASC scenario and serves selections')
+    parser.add_argument('--oasc_scenario_dir', type=str, default='../oasc/oasc_scenarios/')
+    parser.add_argument('--scenario_name', type=str, default='Camilla')
+    parser.add_argument('--random_seed', type=int, default=42)
+    parser.add_argument('--single_model', action='store_true', default=False)
+    parser.add_argument('--model_path', type=str, default=None, help='load the fitted model from / save it to')
+    parser.add_argument('--port', type=int, default=None, help='serve over HTTP (default: stdin / stdout)')
+    return parser.parse_args()
+
+
+def run(args):
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+
+    train_frame, _, description = algsel.scenario.get_oasc_train_and_test_frame(args.oasc_scenario_dir,
+                                                                                args.scenario_name)
+    if args.model_path is not None and os.path.isfile(args.model_path):
+        meta = algsel.models.SklearnModelWrapper.load(args.model_path)
+    else:
+        pipeline = sklearn.pipeline.Pipeline(steps=[('imputer', sklearn.preprocessing.Imputer(strategy='median')),
+                                                    ('classifier', sklearn.ensemble.RandomForestRegressor(
+                                                        n_estimators=256, random_state=args.random_seed))])
+        meta = algsel.models.SklearnModelWrapper(pipeline, args.single_model)
+        meta.fit(train_frame)
+        if args.model_path is not None:
+            meta.save(args.model_path)
+
+    selector = algsel.models.Selector(meta, maximize=description['maximize'][0])
+    logging.info('Expecting features %s' % selector.feature_names)
+    if args.port is None:
+        algsel.models.serve_stdio(selector)
+    else:
+        algsel.models.serve_http(selector, port=args.port)
+
+
+if __name__ == '__main__':
+    run(parse_args())
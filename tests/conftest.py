@@ -0,0 +1,39 @@
+import algsel
+import os
+import pytest
+
+from benchmarks.synthetic import make_scenario
+
+
+SCENARIO_NAME = 'synthetic'
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    # every test gets an empty arff cache
+    path = str(tmp_path / 'cache')
+    monkeypatch.setenv('ALGSEL_CACHE_DIR', path)
+    return path
+
+
+@pytest.fixture(scope='session')
+def scenario_folder(tmp_path_factory):
+    folder = os.path.join(str(tmp_path_factory.mktemp('aslib')), SCENARIO_NAME)
+    make_scenario(folder, n_instances=60, n_algorithms=4, n_features=5, n_repetitions=2, n_folds=3, seed=1)
+    return folder
+
+
+@pytest.fixture(scope='session')
+def oasc_folder(scenario_folder, tmp_path_factory):
+    # repetition 1, fold 1 of the scenario in oasc format
+    folder = str(tmp_path_factory.mktemp('oasc'))
+    algsel.scenario.save_scenario_in_oasc_format(scenario_folder, SCENARIO_NAME, folder, 1, 1, use_cache=False)
+    return folder
+
+
+@pytest.fixture(scope='session')
+def fold_frames(oasc_folder):
+    # train and test frame of a fold, with a row per instance and algorithm
+    train_frame, test_frame, _ = algsel.scenario.get_oasc_train_and_test_frame(oasc_folder, SCENARIO_NAME,
+                                                                               use_cache=False)
+    return train_frame, test_frame[test_frame['repetition'] == 1]
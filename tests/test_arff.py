@@ -0,0 +1,59 @@
+import arff
+import pandas as pd
+
+import algsel
+
+
+ARFF = """@RELATION runs
+
+@ATTRIBUTE instance_id STRING
+@ATTRIBUTE runtime NUMERIC
+@ATTRIBUTE runstatus {ok, 'time out'}
+@ATTRIBUTE started DATE "yyyy-MM-dd HH:mm:ss"
+
+@DATA
+'?',1.5,ok,"2020-01-01 10:00:00"
+?,?,?,?
+x,2,'time out',?
+"""
+
+
+def test_read_arff_missing_values_and_dates(tmp_path):
+    filepath = str(tmp_path / 'runs.arff')
+    with open(filepath, 'w') as fp:
+        fp.write(ARFF)
+    frame, attributes = algsel.scenario.read_arff(filepath)
+
+    # only the unquoted ? is missing
+    assert frame['instance_id'][0] == '?'
+    assert frame.iloc[1].isna().all()
+    assert frame['runtime'].tolist()[::2] == [1.5, 2.0]
+    assert frame['runstatus'][2] == 'time out'
+    assert attributes[3] == ('started', 'DATE "yyyy-MM-dd HH:mm:ss"')
+    assert frame['started'][0] == '2020-01-01 10:00:00'
+
+    # and both survive a round trip
+    copy = str(tmp_path / 'copy.arff')
+    algsel.scenario.write_arff(frame, 'runs', copy, attributes)
+    copy_frame, copy_attributes = algsel.scenario.read_arff(copy)
+    assert copy_attributes == attributes
+    assert copy_frame.equals(frame)
+
+
+def test_write_arff_escapes_line_breaks(tmp_path):
+    frame = pd.DataFrame({
+        'instance_id': ['multi\nline', 'carriage\rreturn', 'tab\tand \\n', "quote's \"both\"", '?'],
+        'algorithm': ['a\r\nb', 'plain', '', 'x,y', '%comment'],
+        'runtime': [1.0, 2.0, 3.0, 4.0, 5.0],
+    })
+    filepath = str(tmp_path / 'runs.arff')
+    algsel.scenario.write_arff(frame, 'runs\nrelation', filepath)
+    with open(filepath) as fp:
+        assert len(fp.read().splitlines()) == 4 + 3 + len(frame)
+
+    copy_frame, _ = algsel.scenario.read_arff(filepath)
+    assert copy_frame.equals(frame)
+    # as liac-arff reads it
+    with open(filepath) as fp:
+        data = arff.load(fp)
+    assert [row[:2] for row in data['data']] == frame[['instance_id', 'algorithm']].values.tolist()
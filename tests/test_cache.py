@@ -0,0 +1,24 @@
+import os
+import pandas as pd
+
+import algsel
+
+
+def test_cached_frame_equals_parsed_frame(scenario_folder, cache_dir, monkeypatch):
+    monkeypatch.setattr(algsel.scenario.cache, 'MIN_CACHE_SIZE', 0)
+    for name in ['algorithm_runs', 'feature_values', 'feature_runstatus', 'feature_costs', 'cv']:
+        filepath = os.path.join(scenario_folder, '%s.arff' % name)
+        frame, attributes = algsel.scenario.read_arff(filepath)
+        # the first load writes the cache, the second reads it
+        algsel.scenario.load_arff_frame(filepath)
+        cached_frame, cached_attributes = algsel.scenario.load_arff_frame(filepath)
+        assert cached_attributes == attributes
+        pd.testing.assert_frame_equal(cached_frame, frame)
+    assert len(os.listdir(cache_dir)) == 5
+
+
+def test_small_files_are_not_cached(scenario_folder, cache_dir):
+    filepath = os.path.join(scenario_folder, 'cv.arff')
+    assert os.path.getsize(filepath) < algsel.scenario.cache.MIN_CACHE_SIZE
+    algsel.scenario.load_arff_frame(filepath)
+    assert not os.path.isdir(cache_dir)
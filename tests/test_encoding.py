@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import algsel
+
+
+TRAIN = pd.DataFrame({
+    'instance_id': ['a', 'a', 'b', 'b'],
+    'algorithm': ['x', 'y', 'x', 'y'],
+    'f0': [1.0, 1.0, np.nan, np.nan],
+    'f1': [2.0, 2.0, 3.0, 3.0],
+    'step_1': ['ok', 'ok', 'timeout', 'timeout'],
+    'objective_function': [1.0, 2.0, 3.0, 4.0],
+})
+
+
+@pytest.mark.parametrize('sparse', [False, True])
+def test_transform_equals_get_dummies(sparse):
+    encoder = algsel.models.FrameEncoder(['algorithm', 'step_1'], sparse=sparse)
+    X = encoder.fit_transform(TRAIN)
+    expected = pd.get_dummies(TRAIN.drop(['instance_id', 'objective_function'], axis=1),
+                              columns=['algorithm', 'step_1'])
+    assert encoder.columns.tolist() == expected.columns.tolist()
+    X = X.toarray() if sparse else X
+    np.testing.assert_array_equal(X, expected.to_numpy(dtype=np.float64))
+    np.testing.assert_array_equal(encoder.transform_target(TRAIN), TRAIN['objective_function'].to_numpy())
+
+
+@pytest.mark.parametrize('sparse', [False, True])
+def test_missing_and_unseen_columns_and_categories(sparse):
+    encoder = algsel.models.FrameEncoder(['algorithm', 'step_1'], sparse=sparse).fit(TRAIN)
+    test = pd.DataFrame({
+        'instance_id': ['c', 'c'],
+        'algorithm': ['y', 'z'],
+        'f1': [5.0, np.nan],
+        'f2': [7.0, 7.0],
+        'objective_function': [1.0, 1.0],
+    })
+    X = encoder.transform(test)
+    X = X.toarray() if sparse else X
+    # f0 and step_1 are missing (zero), f2 and algorithm z were not seen
+    # during fit (ignored), NaN values are kept
+    expected = pd.get_dummies(test.drop(['instance_id', 'objective_function'], axis=1),
+                              columns=['algorithm']).reindex(columns=encoder.columns, fill_value=0)
+    np.testing.assert_array_equal(X, expected.to_numpy(dtype=np.float64))
+    assert X[:, encoder.columns.tolist().index('f0')].tolist() == [0.0, 0.0]
+    assert np.isnan(X[1, encoder.columns.tolist().index('f1')])
+
+
+def test_transform_requires_fit():
+    with pytest.raises(ValueError):
+        algsel.models.FrameEncoder(['algorithm']).transform(TRAIN)
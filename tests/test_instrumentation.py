@@ -0,0 +1,38 @@
+import os
+import pytest
+import sklearn.ensemble
+
+import algsel
+
+from conftest import SCENARIO_NAME
+
+
+@pytest.fixture
+def instrumentation():
+    algsel.instrumentation.reset()
+    algsel.instrumentation.enable()
+    yield algsel.instrumentation
+    algsel.instrumentation.disable()
+    algsel.instrumentation.reset()
+
+
+def test_enable_records_stages(oasc_folder, instrumentation):
+    # the functions of algsel were decorated on import, before enable
+    train = algsel.scenario.load_scenario(os.path.join(oasc_folder, 'train', SCENARIO_NAME), use_cache=False)
+    test = algsel.scenario.load_scenario(os.path.join(oasc_folder, 'test', SCENARIO_NAME), use_cache=False)
+    wrapper = algsel.models.SklearnModelWrapper(sklearn.ensemble.RandomForestRegressor(n_estimators=2), True)
+    test_frame = test.frame[test.frame['repetition'] == 1].fillna(0)
+    wrapper.fit(train.frame.fillna(0))
+    predictions = wrapper.predict(test_frame)
+    schedules = algsel.sweep.schedules_from_predictions(predictions, test.maximize[0])
+    algsel.scoring.Validator().validate_runtime(schedules, test, train)
+
+    summary = instrumentation.summary()
+    for stage in ['scenario.load_scenario', 'models.fit', 'models.predict', 'scoring.validate_runtime']:
+        assert summary.loc[stage, 'calls'] >= 1, stage
+    assert instrumentation.get_trace()['counters']['models.predicted_rows'] == len(test_frame)
+
+    instrumentation.disable()
+    instrumentation.reset()
+    wrapper.predict(test_frame)
+    assert instrumentation.summary().empty
@@ -0,0 +1,102 @@
+import arff
+import numpy as np
+import os
+import pandas as pd
+import pytest
+
+import algsel
+
+from conftest import SCENARIO_NAME
+
+
+def test_load_scenario_on_exported_fold(scenario_folder, tmp_path):
+    oasc_folder = str(tmp_path / 'oasc')
+    algsel.scenario.save_scenario_in_oasc_format(scenario_folder, SCENARIO_NAME, oasc_folder, 2, 3)
+    test = algsel.scenario.load_scenario(os.path.join(oasc_folder, 'test', SCENARIO_NAME))
+    train = algsel.scenario.load_scenario(os.path.join(oasc_folder, 'train', SCENARIO_NAME))
+
+    cv, _ = algsel.scenario.read_arff(os.path.join(scenario_folder, 'cv.arff'))
+    fold = cv[cv['repetition'] == 2]
+    assert sorted(test.instances) == sorted(fold.loc[fold['fold'] == 3, 'instance_id'])
+    assert sorted(train.instances) == sorted(fold.loc[fold['fold'] != 3, 'instance_id'])
+    assert test.feature_steps == ['step_1']
+    assert test.feature_steps_default == ['step_1']
+    assert test.performance_data.shape == (len(test.instances), 4)
+    assert not test.performance_data.isna().any().any()
+
+    # the same as building the fold in memory
+    expected_test, expected_train = algsel.scenario.fold_scenarios(algsel.scenario.CVScenario(scenario_folder), 2, 3)
+    for loaded, expected in [(test, expected_test), (train, expected_train)]:
+        pd.testing.assert_frame_equal(loaded.performance_data, expected.performance_data)
+        pd.testing.assert_frame_equal(loaded.feature_data, expected.feature_data)
+        pd.testing.assert_frame_equal(loaded.frame.reset_index(drop=True), expected.frame.reset_index(drop=True))
+
+    # and the frames of get_oasc_train_and_test_frame
+    train_frame, test_frame, description = algsel.scenario.get_oasc_train_and_test_frame(oasc_folder, SCENARIO_NAME)
+    assert description['scenario_id'] == SCENARIO_NAME
+    pd.testing.assert_frame_equal(test.frame.reset_index(drop=True), test_frame.reset_index(drop=True))
+
+
+def _scenario_files(scenario_folder):
+    return [os.path.join(scenario_folder, '%s.arff' % name)
+            for name in ['feature_values', 'algorithm_runs', 'feature_runstatus']]
+
+
+def _liac_frame(filepath):
+    with open(filepath) as fp:
+        data = arff.load(fp)
+    return pd.DataFrame(data['data'], columns=[att[0] for att in data['attributes']])
+
+
+def test_obtain_dataframe_scenario(scenario_folder):
+    features_file, runs_file, status_file = _scenario_files(scenario_folder)
+    frame = algsel.scenario.obtain_dataframe_scenario(features_file, runs_file, status_file, use_cache=False)
+
+    # as the former implementation, which joined the liac-arff frames
+    features = _liac_frame(features_file).set_index(['instance_id', 'repetition'])
+    features = features.join(_liac_frame(status_file).set_index(['instance_id', 'repetition']))
+    runs = _liac_frame(runs_file)[['instance_id', 'algorithm', 'repetition', 'runtime']]
+    expected = runs.set_index(['instance_id', 'repetition']).join(features).reset_index()
+    expected = expected.rename(columns={'runtime': 'objective_function'})
+    expected = expected[sorted(expected.columns)].sort_values(['instance_id', 'algorithm']).reset_index(drop=True)
+    pd.testing.assert_frame_equal(frame, expected, check_dtype=False)
+
+
+@pytest.mark.parametrize('performance_dtype', [np.float64, np.float32])
+def test_obtain_wide_dataframe_scenario(scenario_folder, performance_dtype):
+    features_file, runs_file, status_file = _scenario_files(scenario_folder)
+    frame = algsel.scenario.obtain_dataframe_scenario(features_file, runs_file, status_file, use_cache=False)
+    wide = algsel.scenario.obtain_dataframe_scenario(features_file, runs_file, status_file, use_cache=False,
+                                                     wide=True, performance_dtype=performance_dtype)
+
+    runs, _ = algsel.scenario.read_arff(runs_file)
+    performance = runs.pivot_table(index=['instance_id', 'repetition'], columns='algorithm', values='runtime')
+    assert (wide.performance.dtypes == performance_dtype).all()
+    assert wide.observed.all()
+    assert len(wide.features) == len(performance)
+    pd.testing.assert_frame_equal(wide.performance.sort_index(), performance.astype(performance_dtype),
+                                  check_names=False)
+    runstatus = runs.set_index(['instance_id', 'repetition', 'algorithm'])['runstatus']
+    assert (wide.runstatus.stack() == runstatus.reindex(wide.runstatus.stack().index)).all()
+    if performance_dtype == np.float64:
+        pd.testing.assert_frame_equal(wide.to_frame(), frame)
+
+
+def test_obtain_wide_dataframe_scenario_with_missing_and_duplicate_runs(scenario_folder, tmp_path):
+    features_file, runs_file, status_file = _scenario_files(scenario_folder)
+    runs, attributes = algsel.scenario.read_arff(runs_file)
+    missing_file = str(tmp_path / 'missing_runs.arff')
+    algsel.scenario.write_arff(runs.iloc[1:], 'algorithm_runs', missing_file, attributes)
+    wide = algsel.scenario.obtain_dataframe_scenario(features_file, missing_file, status_file, use_cache=False,
+                                                     wide=True)
+    # a run that is not in the scenario is not observed, nor in the frame
+    assert (~wide.observed).sum() == 1
+    assert np.isnan(wide.performance.to_numpy()[~wide.observed]).all()
+    expected = algsel.scenario.obtain_dataframe_scenario(features_file, missing_file, status_file, use_cache=False)
+    pd.testing.assert_frame_equal(wide.to_frame(), expected)
+
+    duplicate_file = str(tmp_path / 'duplicate_runs.arff')
+    algsel.scenario.write_arff(pd.concat([runs, runs.iloc[:1]]), 'algorithm_runs', duplicate_file, attributes)
+    with pytest.raises(ValueError):
+        algsel.scenario.obtain_dataframe_scenario(features_file, duplicate_file, status_file, use_cache=False,
+                                                  wide=True)
@@ -0,0 +1,249 @@
+import copy
+import io
+import json
+import numpy as np
+import os
+import pandas as pd
+import pytest
+import sklearn.ensemble
+import sklearn.linear_model
+import sklearn.pipeline
+import sklearn.tree
+
+import algsel
+
+try:
+    from sklearn.impute import SimpleImputer as Imputer
+except ImportError:
+    from sklearn.preprocessing import Imputer
+
+
+def make_pipeline(estimator):
+    return sklearn.pipeline.Pipeline(steps=[('imputer', Imputer()), ('classifier', estimator)])
+
+
+def test_compiled_forest_predicts_as_sklearn():
+    rng = np.random.RandomState(0)
+    X = rng.rand(300, 6)
+    X[rng.rand(*X.shape) < 0.1] = np.nan
+    y = rng.rand(300)
+    models = [make_pipeline(sklearn.ensemble.RandomForestRegressor(n_estimators=8, random_state=0)).fit(X, y),
+              make_pipeline(sklearn.ensemble.ExtraTreesRegressor(n_estimators=4, random_state=0)).fit(X * 2, y),
+              make_pipeline(sklearn.tree.DecisionTreeRegressor(random_state=0)).fit(X[::2], y[::2]),
+              sklearn.ensemble.RandomForestRegressor(n_estimators=4, random_state=0).fit(X, y)]
+    compiled = algsel.models.CompiledForest.from_models(models)
+    test_X = rng.rand(50, 6)
+    test_X[rng.rand(*test_X.shape) < 0.2] = np.nan
+
+    predictions = compiled.predict_groups(test_X)
+    for idx, model in enumerate(models):
+        np.testing.assert_array_equal(predictions[:, idx], model.predict(test_X))
+        np.testing.assert_array_equal(compiled.group(idx).predict(test_X), model.predict(test_X))
+    # other estimators are not compiled
+    ridge = make_pipeline(sklearn.linear_model.Ridge()).fit(X, y)
+    assert algsel.models.CompiledForest.from_models(models + [ridge]) is None
+
+
+def test_batch_predict_equals_per_row_predict(fold_frames):
+    train_frame, test_frame = fold_frames
+    predictions = []
+    for batch_predict in [True, False]:
+        wrapper = algsel.models.SklearnModelWrapper(
+            make_pipeline(sklearn.ensemble.RandomForestRegressor(n_estimators=4, random_state=0)), True,
+            batch_predict=batch_predict)
+        wrapper.fit(train_frame)
+        predictions.append(wrapper.predict(test_frame))
+    assert predictions[0] == predictions[1]
+
+
+@pytest.mark.parametrize('single', [True, False])
+def test_save_and_load(fold_frames, tmp_path, single):
+    train_frame, test_frame = fold_frames
+    wrapper = algsel.models.SklearnModelWrapper(
+        make_pipeline(sklearn.ensemble.RandomForestRegressor(n_estimators=4, random_state=0)), single,
+        keep_training_data=True)
+    wrapper.fit(train_frame)
+    path = str(tmp_path / 'model.joblib')
+    wrapper.save(path)
+
+    loaded = algsel.models.SklearnModelWrapper.load(path)
+    assert isinstance(loaded.compile().nodes, np.memmap)
+    assert loaded._train_X is None
+    assert loaded.predict(test_frame) == wrapper.predict(test_frame)
+
+    # the sklearn models (and the training data) are loaded for partial_fit
+    wrapper.save(path, include_training_data=True)
+    loaded = algsel.models.SklearnModelWrapper.load(path)
+    new_rows = train_frame[train_frame['instance_id'].isin(train_frame['instance_id'].unique()[:5])]
+    loaded.partial_fit(new_rows)
+    wrapper.partial_fit(new_rows)
+    assert loaded.predict(test_frame) == wrapper.predict(test_frame)
+
+
+class CountingModel(object):
+
+    def __init__(self, model):
+        self.model = model
+        self.n_rows = []
+
+    def predict(self, X):
+        self.n_rows.append(len(X))
+        return self.model.predict(X)
+
+
+def test_multi_model_predicts_each_algorithm_once(fold_frames):
+    train_frame, test_frame = fold_frames
+    wrapper = algsel.models.SklearnModelWrapper(
+        make_pipeline(sklearn.ensemble.RandomForestRegressor(n_estimators=4, random_state=0)), False)
+    wrapper.fit(train_frame)
+    # shuffled, the predictions do not depend on the order of the rows
+    test_frame = test_frame.sample(frac=1.0, random_state=0)
+    models = {algorithm_id: CountingModel(model) for algorithm_id, model in wrapper.model.items()}
+    wrapper.model = models
+    predictions = wrapper.predict(test_frame)
+
+    n_instances = test_frame['instance_id'].nunique()
+    assert all(model.n_rows == [n_instances] for model in models.values())
+    for _, row in test_frame.iterrows():
+        # as predicting the row on its own
+        row_X = wrapper.encoder.transform(row.to_frame().T.infer_objects())
+        assert predictions[row['instance_id']][row['algorithm']] == models[row['algorithm']].model.predict(row_X)[0]
+
+
+def test_multi_model_predict_requires_complete_grid(fold_frames):
+    train_frame, test_frame = fold_frames
+    wrapper = algsel.models.SklearnModelWrapper(
+        make_pipeline(sklearn.ensemble.RandomForestRegressor(n_estimators=2, random_state=0)), False)
+    wrapper.fit(train_frame)
+    with pytest.raises(ValueError):
+        wrapper.predict(test_frame.iloc[1:])
+    with pytest.raises(ValueError):
+        wrapper.predict(pd.concat([test_frame.iloc[1:], test_frame.iloc[2:3]]))
+
+
+def _split_instances(frame, n_new):
+    instances = frame['instance_id'].unique()
+    new = frame['instance_id'].isin(instances[-n_new:])
+    return frame[~new], frame[new]
+
+
+@pytest.mark.parametrize('single', [True, False])
+def test_partial_fit_grows_warm_start_forests(fold_frames, single):
+    train_frame, test_frame = fold_frames
+    old_rows, new_rows = _split_instances(train_frame, 10)
+    wrapper = algsel.models.SklearnModelWrapper(
+        make_pipeline(sklearn.ensemble.RandomForestRegressor(n_estimators=8, random_state=0)), single,
+        keep_training_data=True)
+    wrapper.fit(old_rows)
+    models = [wrapper.model] if single else list(wrapper.model.values())
+    old_trees = [list(model[-1].estimators_) for model in models]
+
+    wrapper.partial_fit(new_rows)
+    for model, trees in zip([wrapper.model] if single else list(wrapper.model.values()), old_trees):
+        # the fitted trees are kept, the new ones are fitted on all rows
+        n_old = len(old_rows['instance_id'].unique())
+        assert model[-1].n_estimators == 8 + int(np.ceil(8 * 10 / n_old))
+        assert model[-1].estimators_[:8] == trees
+    assert len(wrapper._train_X) == len(train_frame)
+    assert set(wrapper.predict(test_frame).keys()) == set(test_frame['instance_id'])
+
+
+@pytest.mark.parametrize('single', [True, False])
+def test_partial_fit_updates_with_new_rows_only(fold_frames, single):
+    train_frame, _ = fold_frames
+    old_rows, new_rows = _split_instances(train_frame, 10)
+    wrapper = algsel.models.SklearnModelWrapper(
+        make_pipeline(sklearn.linear_model.SGDRegressor(random_state=0)), single, keep_training_data=True)
+    wrapper.fit(old_rows)
+    expected = {key: copy.deepcopy(model) for key, model in
+                ({None: wrapper.model} if single else wrapper.model).items()}
+
+    wrapper.partial_fit(new_rows)
+    for key, model in expected.items():
+        rows = new_rows if single else new_rows[new_rows['algorithm'] == key]
+        # the fitted imputer is kept
+        model[-1].partial_fit(model[0].transform(wrapper.encoder.transform(rows)),
+                              wrapper.encoder.transform_target(rows))
+        actual = wrapper.model if single else wrapper.model[key]
+        np.testing.assert_array_equal(actual[0].statistics_, model[0].statistics_)
+        np.testing.assert_array_equal(actual[-1].coef_, model[-1].coef_)
+
+
+def test_partial_fit_requires_training_data(fold_frames):
+    train_frame, _ = fold_frames
+    old_rows, new_rows = _split_instances(train_frame, 10)
+    wrapper = algsel.models.SklearnModelWrapper(
+        make_pipeline(sklearn.ensemble.RandomForestRegressor(n_estimators=2)), True)
+    wrapper.fit(old_rows)
+    assert wrapper._train_X is None
+    with pytest.raises(ValueError):
+        wrapper.partial_fit(new_rows)
+
+    # an unfitted wrapper is fitted
+    wrapper = algsel.models.SklearnModelWrapper(
+        make_pipeline(sklearn.ensemble.RandomForestRegressor(n_estimators=2)), True)
+    wrapper.partial_fit(new_rows)
+    assert wrapper.model is not None
+
+
+@pytest.mark.parametrize('single', [True, False])
+def test_partial_fit_of_loaded_linear_model(fold_frames, tmp_path, single):
+    # models that are not compiled are not memory mapped, partial_fit
+    # updates them in place
+    train_frame, test_frame = fold_frames
+    wrapper = algsel.models.SklearnModelWrapper(
+        make_pipeline(sklearn.linear_model.SGDRegressor(random_state=0)), single, keep_training_data=True)
+    wrapper.fit(train_frame)
+    path = str(tmp_path / 'model.joblib')
+    wrapper.save(path, include_training_data=True)
+
+    loaded = algsel.models.SklearnModelWrapper.load(path)
+    assert loaded.compile() is None
+    new_rows = train_frame[train_frame['instance_id'].isin(train_frame['instance_id'].unique()[:5])]
+    loaded.partial_fit(new_rows)
+    wrapper.partial_fit(new_rows)
+    assert loaded.predict(test_frame) == wrapper.predict(test_frame)
+
+
+@pytest.mark.parametrize('single', [True, False])
+def test_save_over_loaded_model(fold_frames, tmp_path, single):
+    # the file is replaced, not rewritten under the memory maps of loaded
+    train_frame, test_frame = fold_frames
+    wrapper = algsel.models.SklearnModelWrapper(
+        make_pipeline(sklearn.ensemble.RandomForestRegressor(n_estimators=4, random_state=0)), single,
+        keep_training_data=True)
+    wrapper.fit(train_frame)
+    path = str(tmp_path / 'model.joblib')
+    wrapper.save(path, include_training_data=True)
+
+    loaded = algsel.models.SklearnModelWrapper.load(path)
+    loaded.save(path, include_training_data=True)
+    assert loaded.predict(test_frame) == wrapper.predict(test_frame)
+    assert algsel.models.SklearnModelWrapper.load(path).predict(test_frame) == wrapper.predict(test_frame)
+    assert sorted(os.listdir(str(tmp_path))) == ['model.joblib', 'model.joblib.models']
+
+
+@pytest.mark.parametrize('single', [True, False])
+def test_selector_scores_as_predict(fold_frames, single):
+    train_frame, test_frame = fold_frames
+    wrapper = algsel.models.SklearnModelWrapper(
+        make_pipeline(sklearn.ensemble.RandomForestRegressor(n_estimators=4, random_state=0)), single)
+    wrapper.fit(train_frame)
+    selector = algsel.models.Selector(wrapper)
+    assert 'repetition' not in selector.feature_names
+
+    predictions = wrapper.predict(test_frame)
+    instances = test_frame.drop_duplicates('instance_id')
+    for _, row in instances.iterrows():
+        scores = selector.scores(row[selector.feature_names].to_numpy(dtype=np.float64), row['step_1'])[0]
+        assert scores.tolist() == [predictions[row['instance_id']][algorithm] for algorithm in selector.algorithms]
+
+    row = instances.iloc[0]
+    stdin = io.StringIO(json.dumps({'features': row[selector.feature_names].tolist(), 'step': row['step_1']}) +
+                        '\n\n{"features": [1.0]}\n')
+    stdout = io.StringIO()
+    algsel.models.serve_stdio(selector, stdin, stdout)
+    responses = [json.loads(line) for line in stdout.getvalue().splitlines()]
+    assert responses[0]['algorithm'] == selector.select(row[selector.feature_names].to_numpy(dtype=np.float64),
+                                                        row['step_1'])[0]
+    assert 'error' in responses[1]
@@ -0,0 +1,63 @@
+import os
+import shutil
+
+import algsel
+
+from conftest import SCENARIO_NAME
+
+
+def _export(scenario_folder, oasc_folder):
+    algsel.scenario.save_scenario_in_oasc_format(scenario_folder, SCENARIO_NAME, oasc_folder, 1, 1,
+                                                 skip_unchanged=True)
+    return os.path.join(oasc_folder, 'test', SCENARIO_NAME)
+
+
+def test_skip_unchanged_checks_and_cleans_files(scenario_folder, tmp_path):
+    oasc_folder = str(tmp_path / 'oasc')
+    test_folder = _export(scenario_folder, oasc_folder)
+    runs_file = os.path.join(test_folder, 'algorithm_runs.arff')
+    modified = os.stat(runs_file).st_mtime_ns
+
+    # unchanged: not written again
+    _export(scenario_folder, oasc_folder)
+    assert os.stat(runs_file).st_mtime_ns == modified
+
+    # a missing file is written again, despite the same content hash
+    os.remove(runs_file)
+    _export(scenario_folder, oasc_folder)
+    assert os.path.isfile(runs_file)
+
+    # files that are no longer part of the scenario are removed
+    changed_folder = str(tmp_path / 'changed' / SCENARIO_NAME)
+    shutil.copytree(scenario_folder, changed_folder)
+    os.remove(os.path.join(changed_folder, 'feature_costs.arff'))
+    _export(changed_folder, oasc_folder)
+    assert sorted(os.listdir(test_folder)) == ['.content_hash', 'algorithm_runs.arff', 'description.txt',
+                                               'feature_runstatus.arff', 'feature_values.arff']
+    assert algsel.scenario.load_scenario(test_folder).feature_cost_data is None
+
+
+def test_cached_fold_export_reuses_hash_and_export(scenario_folder, tmp_path, monkeypatch):
+    cache_folder = str(tmp_path / 'exports')
+    scenario = algsel.scenario.CVScenario(scenario_folder)
+    export_folder = algsel.scenario.cached_fold_export(scenario_folder, SCENARIO_NAME, cache_folder, 1, 2,
+                                                       scenario=scenario)
+
+    # a cache hit neither builds the fold nor hashes the files again
+    def fail(*args):
+        raise AssertionError('unexpected call')
+    monkeypatch.setattr(scenario, 'get_fold', fail)
+    monkeypatch.setattr(algsel.scenario.oasc, '_file_hash', fail)
+    assert algsel.scenario.cached_fold_export(scenario_folder, SCENARIO_NAME, cache_folder, 1, 2,
+                                              scenario=scenario) == export_folder
+    monkeypatch.undo()
+
+    # unless asked to verify, which finds a corrupt export
+    runs_file = os.path.join(export_folder, 'test', SCENARIO_NAME, 'algorithm_runs.arff')
+    os.chmod(runs_file, 0o644)
+    with open(runs_file, 'a') as fp:
+        fp.write('% corrupt\n')
+    algsel.scenario.cached_fold_export(scenario_folder, SCENARIO_NAME, cache_folder, 1, 2, scenario=scenario,
+                                       verify=True)
+    with open(runs_file, 'r') as fp:
+        assert '% corrupt' not in fp.read()
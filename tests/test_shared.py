@@ -0,0 +1,104 @@
+import concurrent.futures
+import gc
+import json
+import multiprocessing
+import numpy as np
+import os
+import pytest
+import sklearn.ensemble
+import subprocess
+import sys
+
+import algsel
+from algsel.models.shared import SharedArrays, attach
+
+from test_models import make_pipeline
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+pytestmark = pytest.mark.skipif(not os.path.isdir('/dev/shm'), reason='requires /dev/shm')
+
+
+def _exists(handle):
+    return os.path.exists(os.path.join('/dev/shm', handle.segment.lstrip('/')))
+
+
+def _sum_attached(handle):
+    with attach(handle) as shared:
+        assert not shared['X'].flags.writeable
+        return float(shared['X'].sum()), float(shared['y'].sum())
+
+
+def _arrays():
+    return {'X': np.arange(12, dtype=np.float64).reshape(4, 3), 'y': np.arange(4, dtype=np.int32)}
+
+
+def test_shared_arrays_are_unlinked_on_close():
+    arrays = _arrays()
+    with SharedArrays(arrays) as shared:
+        assert _exists(shared.handle)
+        with attach(shared.handle) as attached:
+            np.testing.assert_array_equal(attached['X'], arrays['X'])
+            np.testing.assert_array_equal(attached['y'], arrays['y'])
+        # closing an attachment does not unlink
+        assert _exists(shared.handle)
+    assert not _exists(shared.handle)
+    shared.close()  # closing twice is fine
+
+
+def test_shared_arrays_are_unlinked_on_garbage_collection():
+    shared = SharedArrays(_arrays())
+    handle = shared.handle
+    assert _exists(handle)
+    del shared
+    gc.collect()
+    assert not _exists(handle)
+
+
+ATTACH_SCRIPT = """
+import json, sys
+from algsel.models.shared import SharedArraysHandle, attach
+segment, arrays = json.loads(sys.argv[1])
+handle = SharedArraysHandle(segment, tuple((name, dtype, tuple(shape), offset) for name, dtype, shape, offset in arrays))
+with attach(handle) as shared:
+    print(float(shared['X'].sum()), float(shared['y'].sum()))
+"""
+
+
+def test_worker_attach_does_not_unlink():
+    arrays = _arrays()
+    with SharedArrays(arrays) as shared:
+        # a fork shares the resource tracker of the owner
+        with concurrent.futures.ProcessPoolExecutor(max_workers=1,
+                                                    mp_context=multiprocessing.get_context('fork')) as executor:
+            assert list(executor.map(_sum_attached, [shared.handle] * 2)) == [(66.0, 6.0)] * 2
+        assert _exists(shared.handle)
+        # an independent process (e.g., a loky worker) has its own tracker,
+        # which cleans up when the process exits
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join([ROOT, os.environ.get('PYTHONPATH', '')]))
+        output = subprocess.run([sys.executable, '-c', ATTACH_SCRIPT, json.dumps(shared.handle)], env=env,
+                                check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout
+        assert output.split() == ['66.0', '6.0']
+        assert _exists(shared.handle)
+        with attach(shared.handle) as attached:
+            np.testing.assert_array_equal(attached['X'], arrays['X'])
+    assert not _exists(shared.handle)
+
+
+def test_shared_arrays_reject_objects():
+    with pytest.raises(ValueError):
+        SharedArrays({'X': np.array(['a', None], dtype=object)})
+
+
+@pytest.mark.parametrize('prefer', ['threads', 'processes'])
+def test_parallel_fit_equals_serial_fit(fold_frames, prefer):
+    train_frame, test_frame = fold_frames
+    predictions = []
+    for n_jobs in [1, 2]:
+        wrapper = algsel.models.SklearnModelWrapper(
+            make_pipeline(sklearn.ensemble.RandomForestRegressor(n_estimators=4, random_state=0)), False,
+            n_jobs=n_jobs, prefer=prefer)
+        wrapper.fit(train_frame)
+        predictions.append(wrapper.predict(test_frame))
+    assert predictions[0] == predictions[1]
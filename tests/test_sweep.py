@@ -0,0 +1,192 @@
+import os
+import pytest
+import sklearn.ensemble
+import subprocess
+import sys
+import threading
+import time
+
+import algsel
+
+from conftest import SCENARIO_NAME
+from test_models import make_pipeline
+from benchmarks.synthetic import make_scenario
+
+
+def test_schedules_from_predictions():
+    predictions = {'a': {'x': 1.0, 'y': 2.0}, 'b': {'x': 3.0, 'y': 0.5}}
+    assert algsel.sweep.schedules_from_predictions(predictions, False) == {'a': [['x', 99999]], 'b': [['y', 99999]]}
+    assert algsel.sweep.schedules_from_predictions(predictions, True, 10) == {'a': [['y', 10]], 'b': [['x', 10]]}
+
+
+def test_evaluate_oasc_scenarios(tmp_path):
+    oasc_folder = str(tmp_path / 'oasc')
+    for seed in [1, 2]:
+        scenario_folder = str(tmp_path / 'aslib' / ('%s_%d' % (SCENARIO_NAME, seed)))
+        make_scenario(scenario_folder, n_instances=40, n_algorithms=3, n_features=4, n_folds=2, seed=seed)
+        algsel.scenario.save_scenario_in_oasc_format(scenario_folder, os.path.basename(scenario_folder),
+                                                     oasc_folder, 1, 1)
+    scenario_names = ['%s_1' % SCENARIO_NAME, '%s_2' % SCENARIO_NAME]
+    models = {'single': algsel.models.SklearnModelWrapper(
+                  make_pipeline(sklearn.ensemble.RandomForestRegressor(n_estimators=4)), True),
+              'multi': algsel.models.SklearnModelWrapper(
+                  make_pipeline(sklearn.ensemble.RandomForestRegressor(n_estimators=4)), False)}
+
+    results = algsel.sweep.evaluate_oasc_scenarios(oasc_folder, scenario_names, models, random_seed=0)
+    assert results.index.tolist() == [(name, model) for name in scenario_names for model in models]
+    # the models are not modified
+    assert all(meta.model is None for meta in models.values())
+    # unsolvable instances are not counted as timeouts
+    assert (results['solved'] + results['timeouts'] <= 20).all()
+
+    # the same results in a process pool, and with the same seed
+    pooled = algsel.sweep.evaluate_oasc_scenarios(oasc_folder, scenario_names, models, random_seed=0, n_jobs=2)
+    columns = ['PAR1', 'PAR10', 'solved', 'timeouts', 'score', 'score_sbs', 'score_oracle', 'gap_closed']
+    assert pooled[columns].equals(results[columns])
+
+    # which match fitting, predicting and validating by hand
+    train = algsel.scenario.load_scenario(os.path.join(oasc_folder, 'train', scenario_names[0]))
+    test = algsel.scenario.load_scenario(os.path.join(oasc_folder, 'test', scenario_names[0]))
+    meta = algsel.models.SklearnModelWrapper(
+        make_pipeline(sklearn.ensemble.RandomForestRegressor(n_estimators=4, random_state=0)), False)
+    meta.fit(train.frame)
+    schedules = algsel.sweep.schedules_from_predictions(meta.predict(test.frame), test.maximize[0])
+    stat = algsel.scoring.Validator().validate_runtime(schedules, test, train)
+    assert results.loc[(scenario_names[0], 'multi'), 'PAR10'] == stat.get_par10(True)
+
+
+def test_config_hash_is_stable():
+    # the hash identifies stored results across runs and versions
+    assert algsel.sweep.config_hash({'command': 'python run.py v2', 'seed': 1}) == \
+        'fd744df1adf548ef8f7570686e03ecfcb8e86bca'
+    assert algsel.sweep.config_hash({'seed': 1, 'command': 'python run.py v2'}) == \
+        algsel.sweep.config_hash({'command': 'python run.py v2', 'seed': 1})
+    assert algsel.sweep.config_hash({'seed': 2}) != algsel.sweep.config_hash({'seed': 1})
+
+
+def _result(strategy_name='system', fold=1, seed=1, config='a', score=1.0):
+    return {'scenario_name': 'scenario', 'strategy_name': strategy_name, 'repetition': 1, 'fold': fold,
+            'seed': seed, 'config_hash': config, 'PAR10_score': score}
+
+
+def test_result_store(tmp_path):
+    path = str(tmp_path / 'results.sqlite')
+    store = algsel.sweep.ResultStore(path)
+    assert not store.is_done('scenario', 'system', 1, 1, 1, 'a')
+    store.add([_result(), _result('SBS', score=2.0), _result(config='b', score=3.0)])
+    assert store.is_done('scenario', 'system', 1, 1, 1, 'a')
+    assert not store.is_done('scenario', 'system', 1, 2, 1, 'a')
+
+    # a result with an existing key replaces the former one, also when the
+    # store is opened again
+    algsel.sweep.ResultStore(path).add([_result(score=4.0)])
+    frame = store.to_frame(config_hash='a').set_index('strategy_name')
+    assert frame['PAR10_score'].to_dict() == {'system': 4.0, 'SBS': 2.0}
+    assert len(store.to_frame()) == 3
+    assert len(store.to_frame(scenario_name='other')) == 0
+    assert store.to_frame('scenario', 'b')['PAR10_score'].tolist() == [3.0]
+
+
+def test_result_store_from_threads(tmp_path):
+    store = algsel.sweep.ResultStore(str(tmp_path / 'results.sqlite'))
+    threads = [threading.Thread(target=store.add, args=([_result(fold=fold, seed=seed)
+                                                        for fold in range(1, 11)],))
+               for seed in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(store.to_frame()) == 80
+
+
+def _job(name, command, cleaned, collect=lambda: None):
+    def prepare():
+        if command is None:
+            raise RuntimeError('prepare failed')
+        return command
+
+    return algsel.sweep.SweepJob({'job': name}, prepare, collect, cleanup=lambda: cleaned.append(name))
+
+
+def test_sweep_runner(tmp_path):
+    python = subprocess.list2cmdline([sys.executable])
+    marker = str(tmp_path / 'marker')
+    cleaned, results = [], []
+    jobs = [
+        _job('ok', '%s -c "print(42)"' % python, cleaned, collect=lambda: 'result'),
+        _job('failed', '%s -c "import sys; sys.exit(\'broken\')"' % python, cleaned),
+        # the whole shell is killed, not only the shell itself
+        _job('timeout', 'sleep 1.5 && touch %s' % subprocess.list2cmdline([marker]), cleaned),
+        _job('error', None, cleaned),
+    ]
+    runner = algsel.sweep.SweepRunner(str(tmp_path / 'logs'), n_parallel=4, timeout=0.5,
+                                      on_result=lambda job, result: results.append((job.key, result)))
+    statuses = runner.run(jobs)
+
+    assert statuses == [({'job': 'ok'}, 'ok'), ({'job': 'failed'}, 'failed'), ({'job': 'timeout'}, 'timeout'),
+                        ({'job': 'error'}, 'error')]
+    assert results == [({'job': 'ok'}, 'result')]
+    assert sorted(cleaned) == ['error', 'failed', 'ok', 'timeout']
+    # a log per started job, with stdout and stderr
+    with open(str(tmp_path / 'logs' / 'jobok.log')) as fp:
+        assert fp.read() == '42\n'
+    with open(str(tmp_path / 'logs' / 'jobfailed.log')) as fp:
+        assert fp.read() == 'broken\n'
+    assert sorted(os.listdir(str(tmp_path / 'logs'))) == ['jobfailed.log', 'jobok.log', 'jobtimeout.log']
+    time.sleep(1.5)
+    assert not os.path.exists(marker)
+
+
+def test_sweep_runner_takes_jobs_lazily(tmp_path):
+    python = subprocess.list2cmdline([sys.executable])
+    cleaned, in_flight = [], []
+
+    def jobs():
+        for idx in range(6):
+            # jobs that were handed out and are not done yet
+            in_flight.append(idx - len(cleaned))
+            yield _job(str(idx), '%s -c "import time; time.sleep(%.2f)"' % (python, 0.05 * (idx % 3)), cleaned)
+
+    statuses = algsel.sweep.SweepRunner(str(tmp_path / 'logs'), n_parallel=2).run(jobs())
+    assert statuses == [({'job': str(idx)}, 'ok') for idx in range(6)]
+    assert max(in_flight) <= 2
+    assert sorted(cleaned) == [str(idx) for idx in range(6)]
+
+
+def test_sweep_job_name():
+    job = algsel.sweep.SweepJob({'scenario': 'a b/c', 'r': 1}, lambda: '', lambda: None)
+    assert job.name == 'scenarioa_b_c_r1'
+
+
+def _evaluate(configuration, data):
+    data['calls'].append(configuration)
+    return configuration['x'] * data['factor']
+
+
+def _fail(configuration, data):
+    raise AssertionError('should be cached')
+
+
+@pytest.mark.parametrize('n_jobs', [None, 2])
+def test_configuration_sweep(tmp_path, n_jobs):
+    cache_dir = str(tmp_path / 'cache')
+    configurations = [{'x': 1, 'y': 'a'}, {'x': 2}, {'y': 'a', 'x': 1}, {'x': 3}]
+    data = {'factor': 10, 'calls': []}
+    sweep = algsel.sweep.ConfigurationSweep(_evaluate, data, cache_dir=cache_dir, n_jobs=n_jobs)
+    assert sweep.run(configurations) == [10, 20, 10, 30]
+    if n_jobs is None:
+        # duplicates (the same hash) are evaluated once
+        assert data['calls'] == [{'x': 1, 'y': 'a'}, {'x': 2}, {'x': 3}]
+    assert len(os.listdir(cache_dir)) == 3
+
+    # a new sweep takes all results from the cache
+    sweep = algsel.sweep.ConfigurationSweep(_fail, data, cache_dir=cache_dir, n_jobs=n_jobs)
+    assert sweep.run(configurations[::-1]) == [30, 10, 20, 10]
+
+
+def test_configuration_sweep_without_cache():
+    data = {'factor': 2, 'calls': []}
+    sweep = algsel.sweep.ConfigurationSweep(_evaluate, data)
+    assert sweep.run([{'x': 1}, {'x': 1}]) == [2, 2]
+    assert sweep.run([{'x': 1}]) == [2]
+    assert len(data['calls']) == 2
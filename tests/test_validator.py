@@ -0,0 +1,167 @@
+import numpy as np
+import os
+import pytest
+
+import algsel
+
+from conftest import SCENARIO_NAME
+from benchmarks.synthetic import make_scenario
+
+
+def reference_runtime_stats(schedules, test_scenario, train_scenario):
+    # the former, per-entry validation of Validator.validate_runtime
+    stat = algsel.scoring.oasc_validator.Stats(test_scenario.algorithm_cutoff_time, test_scenario.maximize[0])
+    cutoff = test_scenario.algorithm_cutoff_time
+    stat.unsolvable += ((test_scenario.runstatus_data == 'ok').sum(axis=1) == 0).sum()
+    stat.oracle_par10 = test_scenario.performance_data.min(axis=1).sum()
+    sbs = train_scenario.performance_data.sum(axis=0).idxmin()
+    stat.sbs_par10 = test_scenario.performance_data.sum(axis=0)[sbs]
+
+    for inst, schedule in schedules.items():
+        used_time = 0
+        for entry in schedule:
+            if isinstance(entry, str) and entry in test_scenario.feature_steps:
+                used_time += test_scenario.feature_cost_data[entry][inst]
+                solved = test_scenario.feature_runstatus_data[entry][inst] == 'presolved'
+            else:
+                algo, budget = (entry, np.inf) if isinstance(entry, str) else entry
+                time = test_scenario.performance_data[algo][inst]
+                used_time += min(time, budget)
+                solved = (time <= budget) and test_scenario.runstatus_data[algo][inst] == 'ok'
+            if solved and used_time <= cutoff:
+                stat.solved += 1
+                stat.par1 += used_time
+                break
+            elif used_time >= cutoff:
+                stat.timeouts += 1
+                stat.par1 += cutoff
+                break
+        if not solved and used_time < cutoff:
+            stat.timeouts += 1
+            stat.par1 += cutoff
+    stat.par10 = stat.par1 + 9 * cutoff * stat.timeouts
+    return stat
+
+
+def reference_quality_stats(schedules, test_scenario, train_scenario):
+    # the former validation of Validator.validate_quality, on copies (it
+    # multiplied the performance of both scenarios by -1 for maximization)
+    maximize = test_scenario.maximize[0]
+    sign = -1 if maximize else 1
+    test_performance = test_scenario.performance_data * sign
+    train_performance = train_scenario.performance_data * sign
+    stat = algsel.scoring.oasc_validator.Stats(None, maximize)
+    if maximize:
+        stat.oracle_par10 = test_performance.max(axis=1).sum()
+        sbs = train_performance.sum(axis=0).idxmax()
+    else:
+        stat.oracle_par10 = test_performance.min(axis=1).sum()
+        sbs = train_performance.sum(axis=0).idxmin()
+    stat.sbs_par10 = test_performance.sum(axis=0)[sbs]
+
+    for inst, schedule in schedules.items():
+        for entry in schedule:
+            entry = entry[0] if isinstance(entry, list) else entry
+            if entry in test_scenario.algorithms:
+                perf = test_performance[entry][inst]
+                break
+        stat.par1 += perf
+        stat.solved += 1
+        if (perf < test_performance[sbs][inst]) if maximize else (perf > test_performance[sbs][inst]):
+            stat.worse_than_sbs += 1
+    return stat
+
+
+def random_schedules(test_scenario, seed):
+    rng = np.random.RandomState(seed)
+    cutoff = test_scenario.algorithm_cutoff_time or 100.0
+    schedules = dict()
+    for inst in test_scenario.instances:
+        algorithms = rng.choice(test_scenario.algorithms, 2, replace=False).tolist()
+        budgets = rng.uniform(0, cutoff, 2).tolist()
+        schedules[inst] = [
+            [[algorithms[0], cutoff]],
+            ['step_1', [algorithms[0], budgets[0]], [algorithms[1], budgets[1]]],
+            [algorithms[0]],
+            [[algorithms[0], budgets[0]], algorithms[1]],
+        ][rng.randint(4)]
+    return schedules
+
+
+@pytest.fixture(scope='module')
+def scenarios(oasc_folder):
+    test = algsel.scenario.load_scenario(os.path.join(oasc_folder, 'test', SCENARIO_NAME), use_cache=False)
+    train = algsel.scenario.load_scenario(os.path.join(oasc_folder, 'train', SCENARIO_NAME), use_cache=False)
+    return test, train
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_validate_runtime_equals_reference(scenarios, seed):
+    test, train = scenarios
+    schedules = random_schedules(test, seed)
+    stat = algsel.scoring.Validator().validate_runtime(schedules, test, train)
+    expected = reference_runtime_stats(schedules, test, train)
+    for name in ['par1', 'par10', 'timeouts', 'solved', 'unsolvable', 'oracle_par10', 'sbs_par10']:
+        assert getattr(stat, name) == getattr(expected, name), name
+
+
+def test_validate_many_in_pool_equals_serial(scenarios):
+    test, train = scenarios
+    schedules_list = {'system_%d' % seed: random_schedules(test, seed) for seed in range(6)}
+    validator = algsel.scoring.Validator()
+    serial = validator.validate_many(schedules_list, test, train)
+    pooled = validator.validate_many(schedules_list, test, train, n_jobs=2)
+    assert serial.equals(pooled)
+    for name, schedules in schedules_list.items():
+        expected = reference_runtime_stats(schedules, test, train)
+        assert serial.loc[name, 'PAR10'] == expected.get_par10(True)
+
+
+@pytest.fixture(scope='module', params=[False, True], ids=['minimize', 'maximize'])
+def quality_scenarios(request, tmp_path_factory):
+    folder = str(tmp_path_factory.mktemp('quality'))
+    scenario_folder = os.path.join(folder, 'aslib', SCENARIO_NAME)
+    make_scenario(scenario_folder, n_instances=50, n_algorithms=4, n_features=3, n_folds=2, runtime=False,
+                  maximize=request.param, seed=3)
+    algsel.scenario.save_scenario_in_oasc_format(scenario_folder, SCENARIO_NAME, folder, 1, 1, use_cache=False)
+    test = algsel.scenario.load_scenario(os.path.join(folder, 'test', SCENARIO_NAME), use_cache=False)
+    train = algsel.scenario.load_scenario(os.path.join(folder, 'train', SCENARIO_NAME), use_cache=False)
+    return test, train
+
+
+def test_validate_many_quality_has_no_par10(quality_scenarios):
+    test, train = quality_scenarios
+    schedules_list = [random_schedules(test, seed) for seed in range(3)]
+    results = algsel.scoring.Validator().validate_many(schedules_list, test, train)
+    assert results['PAR10'].isna().all()
+    assert results['timeouts'].isna().all()
+    for idx, schedules in enumerate(schedules_list):
+        stat = algsel.scoring.Validator().validate_quality(schedules, test, train)
+        assert results.loc[idx, 'PAR1'] == stat.get_par1(False)
+        assert results.loc[idx, 'solved'] == len(test.instances)
+
+
+def test_validate_quality_equals_reference(quality_scenarios):
+    test, train = quality_scenarios
+    performance = test.performance_data.copy(), train.performance_data.copy()
+    for seed in range(3):
+        schedules = random_schedules(test, seed)
+        stat = algsel.scoring.Validator().validate_quality(schedules, test, train)
+        expected = reference_quality_stats(schedules, test, train)
+        for name in ['par1', 'solved', 'oracle_par10', 'sbs_par10', 'worse_than_sbs']:
+            assert getattr(stat, name) == getattr(expected, name), name
+        # the scenarios are not modified (and validation is repeatable)
+        assert test.performance_data.equals(performance[0])
+        assert train.performance_data.equals(performance[1])
+
+
+def test_validate_quality_oracle(quality_scenarios):
+    test, train = quality_scenarios
+    # the performance of the scenarios is negated for maximization
+    values = test.performance_data * (-1 if test.maximize[0] else 1)
+    best = values.idxmax(axis=1) if test.maximize[0] else values.idxmin(axis=1)
+    oracle = {inst: [[algorithm, 100]] for inst, algorithm in best.items()}
+    stat = algsel.scoring.Validator().validate_quality(oracle, test, train)
+    assert stat.par1 == pytest.approx(stat.oracle_par10, rel=1e-12)
+    assert stat.get_closed_gap(False) == pytest.approx(1.0)
+    assert stat.worse_than_sbs == 0